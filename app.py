@@ -3,14 +3,16 @@ import json
 import logging
 import asyncio
 from datetime import datetime
-from flask import Flask, render_template, request, jsonify
+import time
+import threading
+from flask import Flask, render_template, request, jsonify, g
 from flask_talisman import Talisman
-from flask_limiter import Limiter
-from flask_limiter.util import get_remote_address
 from dotenv import load_dotenv
 from asgiref.sync import async_to_sync
-import threading
-import nest_asyncio
+import atexit
+import signal
+import sys
+import startup
 
 # مكتبات تيليجرام
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
@@ -20,12 +22,18 @@ from telegram.ext import (
 )
 
 import functools
-from database import Database
-from sudoku import SudokuGenerator
+from database import Database, AsyncDatabase, REWARDS
+from sudoku import generate_with_id
+from puzzle_pool import PuzzlePool, PuzzleLibrary
+from bot_runner import BotRunner
+from dispatcher import OutboundDispatcher
+from leaderboard import Leaderboard
+from game_state import GameStore
+from rate_limit import RateLimiter
+from metrics import registry, profiler, HTTP_SECONDS
 
 # ✅ الإعدادات الأساسية
 load_dotenv()
-nest_asyncio.apply()
 logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -34,11 +42,32 @@ app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', os.urandom(24).hex())
 
 # تأمين الرابط لـ Render (تفعيل HTTPS)
 Talisman(app, force_https=False, content_security_policy=None)
-limiter = Limiter(app=app, key_func=get_remote_address, storage_uri="memory://")
 
 # ربط قاعدة البيانات والمولد
-db = Database()
-generator = SudokuGenerator()
+# بدون اتصال أو DDL عند الاستيراد: المخطط يُهيأ مرة واحدة عبر startup.py
+db = Database(lazy=True)
+# نسخة غير متزامنة لمعالجات البوت حتى لا تحجب استعلامات psycopg2 حلقة الأحداث
+adb = AsyncDatabase(db)
+game_store = GameStore(db)
+# أفضل اللاعبين في الذاكرة، تُحمَّل من user_stats وتُحدَّث بعد كل فوز
+leaderboard = Leaderboard(db, size=int(os.environ.get('LEADERBOARD_SIZE', '100')),
+                          ttl=float(os.environ.get('LEADERBOARD_TTL', '300')))
+# حدود لكل مستخدم تيليجرام مشتركة بين كل العمليات: (رموز في الثانية، أقصى رصيد)
+limiter = RateLimiter(db, {
+    'play': (float(os.environ.get('PLAY_RATE', str(10 / 60))), int(os.environ.get('PLAY_BURST', '5'))),
+    'check_solution': (float(os.environ.get('CHECK_RATE', '0.5')), int(os.environ.get('CHECK_BURST', '10'))),
+    'webhook': (float(os.environ.get('WEBHOOK_RATE', '1')), int(os.environ.get('WEBHOOK_BURST', '20'))),
+})
+# PUZZLE_SOURCE=transform يشتق الألغاز من مكتبة أساس مقيّمة بدل التوليد الكامل لكل لعبة
+if os.environ.get('PUZZLE_SOURCE') == 'transform':
+    puzzle_source = PuzzleLibrary(bases_per_difficulty=int(os.environ.get('PUZZLE_LIBRARY_SIZE', '20')))
+else:
+    puzzle_source = generate_with_id
+puzzle_pool = PuzzlePool(
+    high_watermark=int(os.environ.get('PUZZLE_POOL_HIGH', '20')),
+    low_watermark=int(os.environ.get('PUZZLE_POOL_LOW', '5')),
+    source=puzzle_source,
+)
 
 BOT_TOKEN = os.environ.get('BOT_TOKEN')
 GAME_URL = os.environ.get('GAME_URL', '').rstrip('/')
@@ -56,6 +85,10 @@ WELCOME_TEXT = (
     "✅ **هل توافق على الشروط للبدء؟**"
 )
 
+GAME_COST = 100
+MAX_HINTS = 3
+HINT_COST = int(os.environ.get('HINT_COST', '0'))
+
 CHARGE_PACKAGES = [(50, 500), (100, 1000), (300, 3000), (500, 5000), (1000, 10000)]
 WITHDRAW_PACKAGES = [100, 300, 500, 1000]
 
@@ -63,39 +96,48 @@ WITHDRAW_PACKAGES = [100, 300, 500, 1000]
 C_PKG, C_METH, C_PHONE, C_TRANS, C_CONFIRM = range(5)
 W_METH, W_AMT, W_PHONE, W_CONFIRM = range(10, 14)
 
-# --- إعداد البوت (Webhook) ---
-bot_app = Application.builder().token(BOT_TOKEN).build()
+# كل الرسائل الصادرة تمر عبر طابور يحترم حدود تيليجرام، فالمعالج يضيف الرسالة ويعود فوراً
+outbox = OutboundDispatcher(
+    global_rate=float(os.environ.get('OUTBOX_GLOBAL_RATE', '25')),
+    chat_rate=float(os.environ.get('OUTBOX_CHAT_RATE', '1')),
+)
+
+def reply(message, text, **kwargs):
+    outbox.send(message.chat_id, text=text, **kwargs)
+
+def edit(query, text, **kwargs):
+    outbox.send(query.message.chat_id, 'edit_message_text', message_id=query.message.message_id, text=text, **kwargs)
 
 # ✅ القائمة الرئيسية
 async def show_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
-    user = db.get_user_by_telegram_id(user_id)
+    user = await adb.get_user_by_telegram_id(user_id)
     if not user:
-        db.create_user(user_id, update.effective_user.username, update.effective_user.first_name)
-        user = db.get_user_by_telegram_id(user_id)
+        await adb.create_user(user_id, update.effective_user.username, update.effective_user.first_name)
+        user = await adb.get_user_by_telegram_id(user_id)
     
     text = f"🎮 **القائمة الرئيسية**\n👤 {update.effective_user.first_name}\n💰 الرصيد: {user['points']} نقطة"
     kb = [
         [InlineKeyboardButton("🎯 ابدأ اللعب", callback_data='choose_level')],
         [InlineKeyboardButton("💳 شحن نقاط", callback_data='start_charge'), InlineKeyboardButton("💰 سحب رصيد", callback_data='start_withdraw')],
-        [InlineKeyboardButton("👤 حسابي", callback_data='profile')],
+        [InlineKeyboardButton("👤 حسابي", callback_data='profile'), InlineKeyboardButton("🏆 المتصدرون", callback_data='leaderboard')],
         [InlineKeyboardButton("📞 الدعم", url="https://t.me/AskBelal")]
     ]
     reply_markup = InlineKeyboardMarkup(kb)
     if update.callback_query:
-        await update.callback_query.edit_message_text(text, reply_markup=reply_markup, parse_mode='Markdown')
+        edit(update.callback_query, text, reply_markup=reply_markup, parse_mode='Markdown')
     else:
-        await update.message.reply_text(text, reply_markup=reply_markup, parse_mode='Markdown')
+        reply(update.message, text, reply_markup=reply_markup, parse_mode='Markdown')
     return ConversationHandler.END
 
 async def profile_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     user_id = query.from_user.id
-    user = db.get_user_by_telegram_id(user_id)
+    user = await adb.get_user_by_telegram_id(user_id)
     
     text = f"👤 **معلومات الحساب**\n\n🆔 معرفك: `{user_id}`\n💰 رصيدك: {user['points'] if user else 0} نقطة\n🎮 الحالة: نشط"
     kb = [[InlineKeyboardButton("🔙 عودة للقائمة", callback_data='back_to_menu')]]
-    await query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(kb), parse_mode='Markdown')
+    edit(query, text, reply_markup=InlineKeyboardMarkup(kb), parse_mode='Markdown')
 
 async def choose_level_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
@@ -106,20 +148,20 @@ async def choose_level_handler(update: Update, context: ContextTypes.DEFAULT_TYP
         [InlineKeyboardButton("👑 خبير", url=f"{GAME_URL}/play?user={user_id}&difficulty=expert")],
         [InlineKeyboardButton("🔙 عودة", callback_data='back_to_menu')]
     ]
-    await update.callback_query.edit_message_text("🎯 **اختر مستوى التحدي:**", reply_markup=InlineKeyboardMarkup(kb), parse_mode='Markdown')
+    edit(update.callback_query, "🎯 **اختر مستوى التحدي:**", reply_markup=InlineKeyboardMarkup(kb), parse_mode='Markdown')
 
 # ========== نظام الشحن (Charge) ==========
 async def start_charge(update: Update, context: ContextTypes.DEFAULT_TYPE):
     kb = [[InlineKeyboardButton(f"📦 {s}ل.س ({p}ن)", callback_data=f"cp_{s}_{p}")] for s, p in CHARGE_PACKAGES]
     kb.append([InlineKeyboardButton("🔙 إلغاء", callback_data='back_to_menu')])
-    await update.callback_query.edit_message_text("💳 **اختر باقة الشحن:**", reply_markup=InlineKeyboardMarkup(kb), parse_mode='Markdown')
+    edit(update.callback_query, "💳 **اختر باقة الشحن:**", reply_markup=InlineKeyboardMarkup(kb), parse_mode='Markdown')
     return C_PKG
 
 async def charge_pkg_selected(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     context.user_data['c_pkg'] = query.data
     kb = [[InlineKeyboardButton("🇸🇾 سيرياتيل", callback_data='cm_Syriatel')], [InlineKeyboardButton("🟡 MTN", callback_data='cm_MTN')], [InlineKeyboardButton("🔙 إلغاء", callback_data='back_to_menu')]]
-    await query.edit_message_text("🏦 **اختر طريقة الدفع:**", reply_markup=InlineKeyboardMarkup(kb), parse_mode='Markdown')
+    edit(query, "🏦 **اختر طريقة الدفع:**", reply_markup=InlineKeyboardMarkup(kb), parse_mode='Markdown')
     return C_METH
 
 async def charge_meth_selected(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -127,50 +169,50 @@ async def charge_meth_selected(update: Update, context: ContextTypes.DEFAULT_TYP
     method = query.data.split('_')[1]
     context.user_data['c_meth'] = method
     instr = "✅ **سيرياتيل:** حوّل إلى: `49725859`" if method == 'Syriatel' else "✅ **MTN:** حوّل إلى: `8598040534523762`"
-    await query.edit_message_text(f"{instr}\n\n📱 **أرسل رقم الهاتف** الذي حوّلت منه:")
+    edit(query, f"{instr}\n\n📱 **أرسل رقم الهاتف** الذي حوّلت منه:")
     return C_PHONE
 
 async def charge_phone_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data['c_phone'] = update.message.text.strip()
-    await update.message.reply_text("🔢 **أرسل رقم العملية (Transaction ID):**")
+    reply(update.message, "🔢 **أرسل رقم العملية (Transaction ID):**")
     return C_TRANS
 
 async def charge_trans_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data['c_trans'] = update.message.text.strip()
     pkg = context.user_data['c_pkg'].split('_')
     kb = [[InlineKeyboardButton("✅ تأكيد", callback_data='c_confirm')], [InlineKeyboardButton("❌ إلغاء", callback_data='back_to_menu')]]
-    await update.message.reply_text(f"📋 **تأكيد الشحن:**\n📦 {pkg[1]}ل.س\n📱 `{context.user_data['c_phone']}`", reply_markup=InlineKeyboardMarkup(kb), parse_mode='Markdown')
+    reply(update.message, f"📋 **تأكيد الشحن:**\n📦 {pkg[1]}ل.س\n📱 `{context.user_data['c_phone']}`", reply_markup=InlineKeyboardMarkup(kb), parse_mode='Markdown')
     return C_CONFIRM
 
 async def charge_final(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     ud = context.user_data
     pkg = ud['c_pkg'].split('_')
-    user_db = db.get_user_by_telegram_id(query.from_user.id)
-    rid = db.create_charge_request(user_db['id'], int(pkg[1]), int(pkg[2]), ud['c_meth'], ud['c_phone'], ud['c_trans'])
+    user_db = await adb.get_user_by_telegram_id(query.from_user.id)
+    rid = await adb.create_charge_request(user_db['id'], int(pkg[1]), int(pkg[2]), ud['c_meth'], ud['c_phone'], ud['c_trans'])
     admin_kb = [[InlineKeyboardButton("✅ قبول", callback_data=f"appc_{rid}"), InlineKeyboardButton("❌ رفض", callback_data=f"rejc_{rid}")]]
-    await context.bot.send_message(ADMIN_ID, f"🔔 **شحن جديد #{rid}**\n👤 {query.from_user.first_name}\n📦 {pkg[1]}ل.س", reply_markup=InlineKeyboardMarkup(admin_kb))
-    await query.edit_message_text("✅ **تم استلام الطلب!** سيتم مراجعته قريباً.")
+    outbox.send(ADMIN_ID, text=f"🔔 **شحن جديد #{rid}**\n👤 {query.from_user.first_name}\n📦 {pkg[1]}ل.س", reply_markup=InlineKeyboardMarkup(admin_kb))
+    edit(query, "✅ **تم استلام الطلب!** سيتم مراجعته قريباً.")
     return ConversationHandler.END
 
 # ========== نظام السحب (Withdraw) ==========
 async def start_withdraw(update: Update, context: ContextTypes.DEFAULT_TYPE):
     kb = [[InlineKeyboardButton("🇸🇾 سيرياتيل كاش", callback_data='wm_Syriatel'), InlineKeyboardButton("🟡 MTN كاش", callback_data='wm_MTN')], [InlineKeyboardButton("🔙 إلغاء", callback_data='back_to_menu')]]
-    await update.callback_query.edit_message_text("🏦 **اختر طريقة السحب:**", reply_markup=InlineKeyboardMarkup(kb), parse_mode='Markdown')
+    edit(update.callback_query, "🏦 **اختر طريقة السحب:**", reply_markup=InlineKeyboardMarkup(kb), parse_mode='Markdown')
     return W_METH
 
 async def withdraw_meth_selected(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     context.user_data['w_meth'] = query.data.split('_')[1]
     kb = [[InlineKeyboardButton(f"{s} ل.س", callback_data=f"wa_{s}_{s*10}")] for s in WITHDRAW_PACKAGES]
-    await query.edit_message_text("💰 **اختر المبلغ:**", reply_markup=InlineKeyboardMarkup(kb))
+    edit(query, "💰 **اختر المبلغ:**", reply_markup=InlineKeyboardMarkup(kb))
     return W_AMT
 
 async def withdraw_amt_selected(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     _, syp, pts = query.data.split('_')
     context.user_data.update({'w_syp': int(syp), 'w_pts': int(pts)})
-    await query.edit_message_text(f"📱 **أرسل رقم الهاتف** لاستلام المبلغ:")
+    edit(query, f"📱 **أرسل رقم الهاتف** لاستلام المبلغ:")
     return W_PHONE
 
 async def withdraw_phone_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -178,21 +220,24 @@ async def withdraw_phone_input(update: Update, context: ContextTypes.DEFAULT_TYP
     ud = context.user_data
     text = f"📋 **تأكيد سحب {ud['w_syp']} ل.س؟**\n📱 الرقم: {ud['w_phone']}"
     kb = [[InlineKeyboardButton("✅ تأكيد", callback_data='w_confirm')], [InlineKeyboardButton("❌ إلغاء", callback_data='back_to_menu')]]
-    await update.message.reply_text(text, reply_markup=InlineKeyboardMarkup(kb))
+    reply(update.message, text, reply_markup=InlineKeyboardMarkup(kb))
     return W_CONFIRM
 
 async def withdraw_final(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
-    user_db = db.get_user_by_telegram_id(query.from_user.id)
+    user_db = await adb.get_user_by_telegram_id(query.from_user.id, fresh=True)
     ud = context.user_data
 
-    if user_db['points'] < ud['w_pts']:
-        await query.edit_message_text("❌ رصيدك غير كافٍ لإتمام هذه العملية.")
+    if not user_db or user_db['points'] < ud['w_pts']:
+        edit(query, "❌ رصيدك غير كافٍ لإتمام هذه العملية.")
         return ConversationHandler.END
     
     # خصم النقاط وإنشاء طلب سحب (تأكد من وجود جدول withdraw_requests في قاعدة البيانات)
     # أو يمكنك استخدام جدول المراسلات لإخطار الأدمن
-    db.deduct_points(user_db['id'], ud['w_pts'])
+    # الخصم مشروط بالرصيد في نفس الاستعلام، وإذا فشل لا يصل الأدمن طلب بلا تغطية
+    if not await adb.deduct_points(user_db['id'], ud['w_pts']):
+        edit(query, "❌ رصيدك غير كافٍ لإتمام هذه العملية.")
+        return ConversationHandler.END
     
     # إشعار الأدمن بطلب السحب
     admin_text = (
@@ -203,93 +248,96 @@ async def withdraw_final(update: Update, context: ContextTypes.DEFAULT_TYPE):
         f"💵 المبلغ: {ud['w_syp']} ل.س\n"
         f"📉 النقاط المخصومة: {ud['w_pts']}"
     )
-    await context.bot.send_message(ADMIN_ID, admin_text)
+    # طلب السحب سجل مالي: يُرسل كرسالة مستقلة ولا يُجمع في الملخص
+    outbox.send(ADMIN_ID, text=admin_text)
     
-    await query.edit_message_text("✅ **تم استلام طلب السحب بنجاح!** سيتم تحويل المبلغ خلال 24 ساعة.")
+    edit(query, "✅ **تم استلام طلب السحب بنجاح!** سيتم تحويل المبلغ خلال 24 ساعة.")
     return ConversationHandler.END
 
 # --- مسارات Flask ---
 
-def process_update_sync(update_data):
-    """معالجة التحديث بشكل متزامن"""
-    try:
-        update = Update.de_json(update_data, bot_app.bot)
-        
-        # إنشاء حلقة أحداث جديدة
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        try:
-            # التأكد من تهيئة التطبيق
-            if not bot_app.running:
-                loop.run_until_complete(bot_app.initialize())
-            
-            # معالجة التحديث
-            loop.run_until_complete(bot_app.process_update(update))
-            
-        finally:
-            # تنظيف الحلقة
-            loop.run_until_complete(asyncio.sleep(0))
-            loop.close()
-            
-    except Exception as e:
-        logger.error(f"Error processing update: {e}")
+def update_sender_id(update_data):
+    for kind in ('message', 'edited_message', 'callback_query', 'inline_query'):
+        if kind in update_data:
+            return update_data[kind].get('from', {}).get('id')
+    return None
 
 @app.route(f'/{BOT_TOKEN}', methods=['POST'])
 def telegram_webhook():
-    """استقبال webhook من تيليجرام"""
+    """استقبال webhook من تيليجرام وتسليمه لحلقة البوت"""
     update_data = request.get_json(force=True)
-    
-    # معالجة التحديث في نفس الخيط (بدون threading)
-    # أو يمكنك استخدام threading مع تحسينات
-    thread = threading.Thread(target=process_update_sync, args=(update_data,))
-    thread.daemon = True
-    thread.start()
-    
+    sender = update_sender_id(update_data)
+    if sender and not limiter.allow('webhook', sender):
+        # نتجاهل التحديث بدل 429 حتى لا يعيد تيليجرام إرساله
+        logger.warning(f"Rate limit exceeded for Telegram user {sender}")
+        return 'OK', 200
+    if not bot_runner.submit(update_data):
+        # الطابور ممتلئ: تيليجرام سيعيد إرسال التحديث لاحقاً
+        return 'Busy', 503
     return 'OK', 200
 
-async def process_update_task(update):
-    if not bot_app.running:
-        await bot_app.initialize()
-    await bot_app.process_update(update)
-
 @app.route('/play')
 def play():
+    # يبدأ عمال التوليد مع أول لعبة بدل وقت الاستيراد
+    puzzle_pool.start()
     tg_id = request.args.get('user')
     difficulty = request.args.get('difficulty', 'medium')
+    if difficulty not in REWARDS:
+        difficulty = 'medium'
+    if not limiter.allow('play', tg_id):
+        return "⏳ طلبات كثيرة، حاول بعد قليل", 429
+    # فحص مبدئي بالرصيد المخزن مؤقتاً حتى لا يستهلك من لا يملك النقاط لغزاً جاهزاً
     user = db.get_user_by_telegram_id(int(tg_id))
-    if user and user['points'] >= 100:
-        db.deduct_points(user['id'], 100)
-        puzzle, solution = generator.generate_puzzle(difficulty)
-        game_id = db.save_game(user['id'], difficulty, puzzle, solution)
+    if not user or user['points'] < GAME_COST:
+        # الرصيد المخزن قد يسبق شحناً قبله عامل آخر، فلا يُرفض اللاعب قبل قراءة حديثة
+        user = db.get_user_by_telegram_id(int(tg_id), fresh=True)
+    if not user or user['points'] < GAME_COST:
+        return render_template('no_points.html', points=user['points'] if user else 0)
+    item = puzzle_pool.get(difficulty)
+    puzzle, solution, puzzle_id = item
+    # فحص الرصيد والخصم وحفظ اللعبة في معاملة واحدة (يُخزَّن معرّف اللغز بدل الشبكتين)
+    started = db.start_game(int(tg_id), GAME_COST, difficulty, puzzle, solution, puzzle_id=puzzle_id)
+    if started:
+        game_id, new_points = started
         return render_template('game.html', puzzle_json=json.dumps(puzzle), solution_json=json.dumps(solution), 
-                             game_id=game_id, tg_id=tg_id, difficulty=difficulty, user_points=user['points']-100)
+                             game_id=game_id, tg_id=tg_id, difficulty=difficulty, user_points=new_points)
+    puzzle_pool.put_back(difficulty, item)
+    user = db.get_user_by_telegram_id(int(tg_id), fresh=True)
     return render_template('no_points.html', points=user['points'] if user else 0)
 
+def finish_game(game, **extra):
+    # إضافة النقاط بناءً على المستوى
+    reward = REWARDS.get(game['difficulty'], 0)
+    
+    # إنهاء اللعبة وتزويد رصيد المستخدم في معاملة واحدة حتى لا تُصرف المكافأة مرتين
+    won = db.complete_game(game['id'], reward)
+    game_store.discard(game['id'])
+    if won is None:
+        return jsonify({'success': False, 'error': 'تم إنهاء هذه اللعبة مسبقاً'}), 409
+    leaderboard.record(won['user_id'], won['first_name'], won['points_earned'])
+    
+    return jsonify({'success': True, 'reward': reward, 'new_points': won['points'], **extra})
+
 @app.route('/check_solution', methods=['POST'])
 def check_solution():
     try:
         data = request.get_json()
         game_id = data.get('game_id')
-        user_solution = data.get('solution') # مصفوفة الحل المرسلة من اللاعب
+        user_solution = data.get('solution') or data.get('board') # مصفوفة الحل المرسلة من اللاعب
 
         # جلب اللعبة من قاعدة البيانات للتأكد من الحل
         game = db.get_game(game_id)
         if not game:
             return jsonify({'success': False, 'error': 'اللعبة غير موجودة'}), 404
+        # الحد على صاحب اللعبة لا على tg_id المرسل في الطلب حتى لا يُتجاوز بتغييره
+        if not limiter.allow('check_solution', game['user_id']):
+            return jsonify({'success': False, 'error': '⏳ محاولات كثيرة، حاول بعد قليل'}), 429
 
         correct_solution = game['solution'] # الحل الصحيح المخزن عند إنشاء اللعبة
 
         # مقارنة الحلول
         if user_solution == correct_solution:
-            # إضافة النقاط بناءً على المستوى
-            points_map = {'easy': 500, 'medium': 1000, 'hard': 1500, 'expert': 5000}
-            reward = points_map.get(game['difficulty'], 0)
-            
-            # تحديث حالة اللعبة في قاعدة البيانات (اختياري) وتزويد رصيد المستخدم
-            db.add_points(game['user_id'], reward, reason=f"Won {game['difficulty']} game")
-            
-            return jsonify({'success': True, 'reward': reward})
+            return finish_game(game)
         else:
             return jsonify({'success': False, 'error': 'الحل غير صحيح، حاول مجدداً!'})
 
@@ -297,6 +345,78 @@ def check_solution():
         logger.error(f"Error in check_solution: {e}")
         return jsonify({'success': False, 'error': 'خطأ داخلي في السيرفر'}), 500
 
+def int_fields(data, *names):
+    """قراءة حقول صحيحة من جسم الطلب، ترفع ValueError إذا كان أحدها مفقوداً أو غير رقمي"""
+    try:
+        return [int(data[name]) for name in names]
+    except (KeyError, TypeError, ValueError):
+        raise ValueError(f"Invalid request fields: {', '.join(names)}")
+
+@app.route('/move', methods=['POST'])
+def move():
+    """التحقق من حركة واحدة في O(1) واكتشاف اكتمال اللوحة"""
+    try:
+        data = request.get_json(silent=True) or {}
+        try:
+            game_id, row, col = int_fields(data, 'game_id', 'row', 'col')
+            value = int(data.get('value') or 0)
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'حركة غير صالحة'}), 400
+        state = game_store.get(game_id)
+        if not state:
+            return jsonify({'success': False, 'error': 'اللعبة غير موجودة'}), 404
+        with state.lock:
+            try:
+                result = state.move(row, col, value)
+            except ValueError:
+                return jsonify({'success': False, 'error': 'حركة غير صالحة'}), 400
+        if result['complete']:
+            return finish_game(db.get_game(state.game_id))
+        return jsonify({'success': True, **result})
+
+    except Exception as e:
+        logger.error(f"Error in move: {e}")
+        return jsonify({'success': False, 'error': 'خطأ داخلي في السيرفر'}), 500
+
+@app.route('/get_hint', methods=['POST'])
+def get_hint():
+    try:
+        data = request.get_json(silent=True) or {}
+        try:
+            game_id, tg_id = int_fields(data, 'game_id', 'tg_id')
+        except ValueError:
+            return jsonify({'success': False, 'error': 'طلب غير صالح'}), 400
+        state = game_store.get(game_id)
+        if not state:
+            return jsonify({'success': False, 'error': 'اللعبة غير موجودة'}), 404
+        user = db.get_user_by_telegram_id(tg_id)
+        if not user:
+            return jsonify({'success': False, 'error': 'المستخدم غير موجود'}), 404
+        # التلميح يُخصم من صاحب اللعبة فقط، فلا يطلبه أحد على لعبة غيره أو من رصيد غيره
+        if user['id'] != state.user_id:
+            return jsonify({'success': False, 'error': 'هذه اللعبة ليست لك'}), 403
+        with state.lock:
+            if state.hints_used >= MAX_HINTS:
+                return jsonify({'success': False, 'error': '❌ استنفدت كل التلميحات المتاحة'})
+            # التأكد من وجود خلية تُكشف قبل الخصم حتى لا يدفع اللاعب مقابل لا شيء
+            if not state.hint_available():
+                return jsonify({'success': False, 'error': 'لا توجد خلايا متبقية'})
+            if HINT_COST and not db.deduct_points(user['id'], HINT_COST):
+                return jsonify({'success': False, 'error': '❌ رصيدك غير كافٍ للحصول على تلميح'})
+            hint = state.hint()
+            hints_used = state.hints_used
+            complete = state.complete
+        db.increment_hints(state.game_id)
+        if complete:
+            # التلميح ملأ آخر خلية: تنتهي اللعبة وتُصرف المكافأة
+            return finish_game(db.get_game(state.game_id), hint=hint, hints_remaining=MAX_HINTS - hints_used)
+        return jsonify({'success': True, 'hint': hint, 'new_points': user['points'] - HINT_COST,
+                        'hints_remaining': MAX_HINTS - hints_used})
+
+    except Exception as e:
+        logger.error(f"Error in get_hint: {e}")
+        return jsonify({'success': False, 'error': 'خطأ داخلي في السيرفر'}), 500
+
 # --- تسجيل المعالجات (Handlers) ---
 
 charge_handler = ConversationHandler(
@@ -322,46 +442,143 @@ withdraw_handler = ConversationHandler(
     fallbacks=[CallbackQueryHandler(show_main_menu, pattern='^back_to_menu$')]
 )
 
-bot_app.add_handler(charge_handler)
-bot_app.add_handler(withdraw_handler)
-bot_app.add_handler(CommandHandler("start", lambda u, c: u.message.reply_text(WELCOME_TEXT, reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("✅ موافق", callback_data='back_to_menu')]]), parse_mode='Markdown')))
-bot_app.add_handler(CallbackQueryHandler(show_main_menu, pattern='^back_to_menu$'))
-async def setup_webhook():
-    await bot_app.bot.set_webhook(url=f"{GAME_URL}/{BOT_TOKEN}")
-
 async def choose_level(update, context):
     user_id = update.effective_user.id
     kb = [[InlineKeyboardButton("🥉 سهل", url=f"{GAME_URL}/play?user={user_id}&difficulty=easy")],[InlineKeyboardButton("🥈 متوسط", url=f"{GAME_URL}/play?user={user_id}&difficulty=medium")],[InlineKeyboardButton("🥇 صعب", url=f"{GAME_URL}/play?user={user_id}&difficulty=hard")],[InlineKeyboardButton("👑 خبير", url=f"{GAME_URL}/play?user={user_id}&difficulty=expert")],[InlineKeyboardButton("🔙 عودة", callback_data='back_to_menu')]]
-    await update.callback_query.edit_message_text("🎯 **اختر المستوى:**", reply_markup=InlineKeyboardMarkup(kb), parse_mode='Markdown')
+    edit(update.callback_query, "🎯 **اختر المستوى:**", reply_markup=InlineKeyboardMarkup(kb), parse_mode='Markdown')
+
+LEVEL_NAMES = {'easy': '🥉 سهل', 'medium': '🥈 متوسط', 'hard': '🥇 صعب', 'expert': '👑 خبير'}
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes}:{seconds:02d}"
 
 async def profile_view(update, context):
-    user = db.get_user_by_telegram_id(update.effective_user.id)
-    text = f"👤 **حسابي**\n💰 الرصيد: {user['points']} نقطة\n🆔 معرفك: `{user['telegram_id']}`"
-    await update.callback_query.edit_message_text(text, reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 عودة", callback_data='back_to_menu')]]), parse_mode='Markdown')
+    user = await adb.get_user_by_telegram_id(update.effective_user.id)
+    # صفوف user_stats الجاهزة بدل تجميع جدول games عند كل عرض
+    stats = await adb.get_user_stats(user['id'])
+    total = stats.get('all', {})
+    text = (f"👤 **حسابي**\n💰 الرصيد: {user['points']} نقطة\n🆔 معرفك: `{user['telegram_id']}`\n\n"
+            f"🎮 الألعاب: {total.get('games_started', 0)} | 🏅 الانتصارات: {total.get('wins', 0)}\n"
+            f"⭐ النقاط المكتسبة: {total.get('points_earned', 0)}")
+    if leaderboard.stale:
+        await asyncio.to_thread(leaderboard.ensure_fresh)
+    rank = leaderboard.rank(user['id'])
+    if rank:
+        text += f"\n🏆 ترتيبك: #{rank}"
+    for level, name in LEVEL_NAMES.items():
+        row = stats.get(level)
+        if row and row['wins']:
+            text += f"\n{name}: {row['wins']} فوز، متوسط الحل {format_duration(row['avg_solve_seconds'])}"
+    edit(update.callback_query, text, reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 عودة", callback_data='back_to_menu')]]), parse_mode='Markdown')
+
+async def leaderboard_view(update, context):
+    if leaderboard.stale:
+        await asyncio.to_thread(leaderboard.ensure_fresh)
+    entries = leaderboard.top(10)
+    lines = [f"{i}. {e['first_name'] or e['user_id']} — {e['points_earned']} نقطة" for i, e in enumerate(entries, 1)]
+    text = "🏆 **المتصدرون**\n\n" + ("\n".join(lines) or "لا يوجد فائزون بعد")
+    edit(update.callback_query, text, reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 عودة", callback_data='back_to_menu')]]), parse_mode='Markdown')
+
+async def profile_command(update, context):
+    """أمر الأدمن /profile N لتحليل أداء الطلبات الـN التالية"""
+    if update.effective_user.id != ADMIN_ID:
+        return
+    count = int(context.args[0]) if context.args and context.args[0].isdigit() else 10
+    profiler.arm(count)
+    reply(update.message, f"🔬 سيتم تحليل أداء {count} طلبات قادمة")
+
+async def start_command(update, context):
+    reply(update.message, WELCOME_TEXT, reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("✅ موافق", callback_data='back_to_menu')]]), parse_mode='Markdown')
+
+def build_bot_app():
+    builder = Application.builder().token(BOT_TOKEN)
+    # BOT_API_URL يوجه البوت إلى خادم Bot API محلي أو بديل للاختبار
+    if os.environ.get('BOT_API_URL'):
+        builder = builder.base_url(os.environ['BOT_API_URL'])
+    bot_app = builder.build()
+    outbox.bot = bot_app.bot
+    bot_app.add_handler(charge_handler)
+    bot_app.add_handler(withdraw_handler)
+    bot_app.add_handler(CommandHandler("start", start_command))
+    bot_app.add_handler(CallbackQueryHandler(show_main_menu, pattern='^back_to_menu$'))
+    bot_app.add_handler(CommandHandler("profile", profile_command))
+    bot_app.add_handler(CallbackQueryHandler(choose_level, pattern='^choose_level$'))
+    bot_app.add_handler(CallbackQueryHandler(profile_view, pattern='^profile$'))
+    bot_app.add_handler(CallbackQueryHandler(leaderboard_view, pattern='^leaderboard$'))
+    return bot_app
 
-bot_app.add_handler(CallbackQueryHandler(choose_level, pattern='^choose_level$'))
-bot_app.add_handler(CallbackQueryHandler(profile_view, pattern='^profile$'))
+# --- إعداد البوت (Webhook) ---
+# يُبنى تطبيق البوت عند أول تحديث فقط، على حلقة أحداث واحدة دائمة بدل خيط وحلقة جديدين لكل تحديث
+bot_runner = BotRunner(factory=build_bot_app, max_pending=int(os.environ.get('BOT_MAX_PENDING', '1000')),
+                       on_shutdown=outbox.close)
+atexit.register(bot_runner.shutdown)
+
+def handle_sigterm(signum, frame):
+    # SIGTERM (إيقاف المنصة أو إعادة النشر) يقتل العملية دون atexit؛ الخروج النظامي يفرّغ التحديثات والرسائل المعلقة
+    logger.info("SIGTERM received, draining bot updates and outbound messages")
+    sys.exit(0)
+
+def warm_up():
+    """تشغيل عمال التوليد وتهيئة البوت مسبقاً خارج مسار الطلبات"""
+    puzzle_pool.start()
+    try:
+        bot_runner.start()
+    except Exception as e:
+        logger.error(f"Bot warm-up failed, will retry on first update: {e}")
+
+# --- القياسات ---
 
 @app.before_request
-def init_webhook():
-    """تهيئة webhook مرة واحدة فقط"""
-    if not hasattr(app, 'webhook_initialized'):
-        try:
-            # استخدام حلقة أحداث منفصلة لتعيين webhook
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            
-            async def setup():
-                await bot_app.bot.set_webhook(url=f"{GAME_URL}/{BOT_TOKEN}")
-                logger.info(f"Webhook set to {GAME_URL}/{BOT_TOKEN}")
-            
-            loop.run_until_complete(setup())
-            loop.close()
-            
-            app.webhook_initialized = True
-            
-        except Exception as e:
-            logger.error(f"Webhook initialization error: {e}")
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    profiler.begin()
+
+@app.after_request
+def record_request_time(response):
+    profiler.end(f"{request.method} {request.path}")
+    if 'request_start' in g:
+        HTTP_SECONDS.observe(time.perf_counter() - g.request_start, endpoint=request.endpoint or 'unknown')
+    return response
+
+registry.register_gauges('puzzle_pool_size', 'Ready puzzles per difficulty',
+                         lambda: [({'difficulty': d}, s['size']) for d, s in puzzle_pool.stats().items()])
+POOL_RESULTS = {'hit': 'hits', 'miss': 'misses'}
+registry.register_counters('puzzle_pool_requests_total', 'Pool hits and misses per difficulty',
+                           lambda: [({'difficulty': d, 'result': r}, s[key]) for d, s in puzzle_pool.stats().items()
+                                    for r, key in POOL_RESULTS.items()])
+# المجاميع المتزايدة تُعرض كعدادات (اسم لكل مجموع) والباقي كمقاييس لحظية
+DB_POOL_TOTALS = {
+    'created': ('db_pool_connections_created_total', 'Database connections opened'),
+    'discarded': ('db_pool_connections_discarded_total', 'Broken database connections discarded'),
+    'checkouts': ('db_pool_checkouts_total', 'Database connection checkouts'),
+    'wait_total_seconds': ('db_pool_wait_seconds_total', 'Time spent waiting for a database connection'),
+}
+CACHE_TOTALS = {
+    'hits': ('cache_hits_total', 'In-process cache hits'),
+    'misses': ('cache_misses_total', 'In-process cache misses'),
+    'evictions': ('cache_evictions_total', 'In-process cache evictions'),
+}
+registry.register_gauges('db_pool', 'Database connection pool state',
+                         lambda: [({'stat': k}, v) for k, v in db.pool_stats().items() if k not in DB_POOL_TOTALS])
+for key, (name, help_text) in DB_POOL_TOTALS.items():
+    registry.register_counters(name, help_text, lambda key=key: [({}, db.pool_stats()[key])])
+registry.register_gauges('cache', 'In-process cache statistics',
+                         lambda: [({'cache': c, 'stat': k}, v) for c, st in db.cache_stats().items()
+                                  for k, v in st.items() if k not in CACHE_TOTALS])
+for key, (name, help_text) in CACHE_TOTALS.items():
+    registry.register_counters(name, help_text, lambda key=key: [({'cache': c}, st[key]) for c, st in db.cache_stats().items()])
+registry.register_gauges('bot_updates_pending', 'Telegram updates waiting on the bot loop',
+                         lambda: [({}, bot_runner.pending())])
+registry.register_gauges('telegram_outbound_pending', 'Outbound Bot API calls waiting in the dispatcher',
+                         lambda: [({}, outbox.pending())])
+
+@app.route('/metrics')
+def metrics_endpoint():
+    token = os.environ.get('METRICS_TOKEN')
+    if token and request.args.get('token') != token:
+        return 'Forbidden', 403
+    return registry.render(), 200, {'Content-Type': 'text/plain; version=0.0.4'}
 
 # مسار أساسي للتأكد من عمل السيرفر (Health Check)
 @app.route('/')
@@ -369,5 +586,10 @@ def home():
     return "Sudoku Bot is Running!", 200
 
 if __name__ == '__main__':
+    # عملية واحدة تخدم كل شيء: هي القائد الذي يهيئ المخطط ويسجل webhook، في الخلفية حتى لا يتأخر أول طلب
+    if os.environ.get('RUN_STARTUP_TASKS', '1') != '0':
+        startup.run_in_background()
+    threading.Thread(target=warm_up, name='warm-up', daemon=True).start()
+    signal.signal(signal.SIGTERM, handle_sigterm)
     port = int(os.environ.get('PORT', 10000))
     app.run(host='0.0.0.0', port=port)
@@ -0,0 +1,93 @@
+"""التحقق المتجهي من دفعات كبيرة من اللوحات باستخدام NumPy (للتدقيق وإعادة التحقق من الألعاب القديمة)"""
+import logging
+import multiprocessing
+import random
+
+import numpy as np
+
+from codec import decode_grid, encode_grid
+from sudoku import regenerate_many, can_regenerate
+
+logger = logging.getLogger(__name__)
+
+# مجموع بتات الأرقام 1-9 عند تمثيل الرقم d بالبت (1 << d)
+FULL_MASK = 0x3FE
+
+
+def validate_boards(boards):
+    """boards مصفوفة (N, 9, 9)، يعيد مصفوفة bool بطول N: هل كل لوحة حل سودوكو صحيح"""
+    boards = np.asarray(boards)
+    in_range = ((boards >= 1) & (boards <= 9)).all(axis=(1, 2))
+    bits = np.left_shift(1, np.clip(boards, 0, 9).astype(np.int16))
+    # تسعة أرقام من 1-9 يكون OR بتاتها FULL_MASK فقط إذا كانت كلها مختلفة
+    rows = (np.bitwise_or.reduce(bits, axis=2) == FULL_MASK).all(axis=1)
+    cols = (np.bitwise_or.reduce(bits, axis=1) == FULL_MASK).all(axis=1)
+    boxes = bits.reshape(-1, 3, 3, 3, 3).transpose(0, 1, 3, 2, 4).reshape(-1, 9, 9)
+    boxes = (np.bitwise_or.reduce(boxes, axis=2) == FULL_MASK).all(axis=1)
+    return in_range & rows & cols & boxes
+
+
+def compare_solutions(boards, solutions):
+    """يعيد (mismatch, matches): قناع (N, 9, 9) للخلايا المختلفة عن الحل المخزن وbool بطول N"""
+    mismatch = np.asarray(boards) != np.asarray(solutions)
+    return mismatch, ~mismatch.any(axis=(1, 2))
+
+
+def givens_consistent(puzzles, solutions):
+    """هل تطابق الأرقام المعطاة في كل لغز الحل المخزن له"""
+    puzzles = np.asarray(puzzles)
+    return ((puzzles == 0) | (puzzles == np.asarray(solutions))).all(axis=(1, 2))
+
+
+def _to_array(grids):
+    if all(g and len(g) == 81 and not g.startswith('[') for g in grids):
+        raw = np.frombuffer(''.join(grids).encode('ascii'), dtype=np.uint8) - ord('0')
+        return raw.reshape(-1, 9, 9).astype(np.int8)
+    return np.array([decode_grid(g) for g in grids], dtype=np.int8)
+
+
+def iter_game_batches(db, chunk_size=10000, status=None, workers=None):
+    """قراءة الألعاب على دفعات عبر مؤشر على الخادم، يعيد (ids, puzzles, solutions) لكل دفعة
+
+    الألعاب المخزنة بمعرّف لغز فقط تُعاد شبكاتها مرة لكل معرّف مختلف في الدفعة، موزعة على workers عملية
+    (None لكل الأنوية، 1 للعملية الحالية). معرّفات إصدار مولد سابق بلا شبكات تُتخطى مع تحذير.
+    """
+    workers = workers or multiprocessing.cpu_count()
+    # العمليات تُنشأ قبل فتح الاتصال حتى لا ترث مقبس قاعدة البيانات
+    pool = multiprocessing.Pool(workers, initializer=random.seed) if workers > 1 else None
+    try:
+        yield from _iter_game_batches(db, chunk_size, status, pool)
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+
+def _iter_game_batches(db, chunk_size, status, pool):
+    with db.get_connection() as conn:
+        with conn.cursor(name='batch_validate') as cursor:
+            cursor.itersize = chunk_size
+            if status:
+                cursor.execute('SELECT id, puzzle_data, solution_data, puzzle_id FROM games WHERE status = %s ORDER BY id', (status,))
+            else:
+                cursor.execute('SELECT id, puzzle_data, solution_data, puzzle_id FROM games ORDER BY id')
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                regenerated = regenerate_many([r[3] for r in rows if r[3] and not r[1] and can_regenerate(r[3])], pool)
+                ids, puzzles, solutions = [], [], []
+                skipped = 0
+                for game_id, puzzle_data, solution_data, puzzle_id in rows:
+                    if puzzle_id and not puzzle_data:
+                        if puzzle_id not in regenerated:
+                            skipped += 1
+                            continue
+                        puzzle, solution = regenerated[puzzle_id]
+                        puzzle_data, solution_data = encode_grid(puzzle), encode_grid(solution)
+                    ids.append(game_id)
+                    puzzles.append(puzzle_data)
+                    solutions.append(solution_data)
+                if skipped:
+                    logger.warning(f"Skipped {skipped} games whose puzzle ids this generator version cannot rebuild")
+                if ids:
+                    yield np.array(ids), _to_array(puzzles), _to_array(solutions)
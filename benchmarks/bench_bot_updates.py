@@ -0,0 +1,59 @@
+"""اختبار حمل: تحديثات بوت متزامنة تقرأ المستخدم من PostgreSQL محلي
+
+يقارن معالجاً يستدعي Database مباشرة (يحجب الحلقة) بمعالج ينتظر AsyncDatabase.
+كل تحديث محاكى يقرأ المستخدم ثم ينتظر 5ms بدل استدعاء Bot API.
+
+الاستخدام: DATABASE_URL=postgresql://localhost/sudoku_bench python -m benchmarks.bench_bot_updates [عدد التحديثات] [التزامن]
+"""
+import asyncio
+import os
+import sys
+import time
+
+from database import Database, AsyncDatabase
+
+TELEGRAM_ID = 900000001
+API_LATENCY = 0.005
+
+
+async def blocking_handler(db):
+    db.get_user_by_telegram_id(TELEGRAM_ID)
+    await asyncio.sleep(API_LATENCY)
+
+
+async def async_handler(adb):
+    await adb.get_user_by_telegram_id(TELEGRAM_ID)
+    await asyncio.sleep(API_LATENCY)
+
+
+async def drive(handler, target, updates, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await handler(target)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(updates)))
+    return updates / (time.perf_counter() - start)
+
+
+def main():
+    updates = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    db = Database(os.environ['DATABASE_URL'], maxconn=concurrency)
+    # تعطيل الذاكرة المؤقتة حتى يصل كل تحديث إلى قاعدة البيانات
+    db.user_cache.ttl = 0
+    db.create_user(TELEGRAM_ID, 'bench', 'Bench')
+    adb = AsyncDatabase(db)
+    try:
+        before = asyncio.run(drive(blocking_handler, db, updates, concurrency))
+        after = asyncio.run(drive(async_handler, adb, updates, concurrency))
+    finally:
+        adb.close()
+    print(f"sync handlers : {before:8.1f} updates/s")
+    print(f"async handlers: {after:8.1f} updates/s ({after / before:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
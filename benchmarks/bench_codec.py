@@ -0,0 +1,32 @@
+"""مقارنة حجم الصف وزمن فك الترميز: JSON القديم مقابل نص الـ81 رقماً والحزم بـ4 بتات
+
+الاستخدام: python -m benchmarks.bench_codec [عدد التكرارات]
+"""
+import json
+import random
+import sys
+import timeit
+
+from codec import encode_grid, decode_grid, pack_grid, unpack_grid
+from sudoku import SudokuGenerator
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    random.seed(1234)
+    puzzle, solution = SudokuGenerator().generate_puzzle('medium')
+    formats = (
+        ('json', json.dumps, json.loads),
+        ('digits', encode_grid, decode_grid),
+        ('nibbles', pack_grid, unpack_grid),
+    )
+    for name, encode, decode in formats:
+        data = encode(puzzle)
+        assert decode(data) == puzzle and decode(encode(solution)) == solution
+        size = len(data) + len(encode(solution))
+        seconds = timeit.timeit(lambda: (decode(data), decode(data)), number=number)
+        print(f"{name:8s} {size:4d} bytes/row  {seconds / number * 1e6:7.2f} us to decode puzzle+solution")
+
+
+if __name__ == '__main__':
+    main()
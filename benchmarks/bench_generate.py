@@ -0,0 +1,32 @@
+"""عدد الألغاز المولدة في الثانية لكل مستوى صعوبة مع ضمان الحل الوحيد
+
+الاستخدام: python -m benchmarks.bench_generate [عدد الألغاز لكل مستوى]
+"""
+import random
+import sys
+import time
+
+from solver import BitmaskSolver
+from sudoku import SudokuGenerator
+
+DIFFICULTIES = ['easy', 'medium', 'hard', 'expert']
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    generator = SudokuGenerator()
+    for difficulty in DIFFICULTIES:
+        random.seed(1234)
+        blanks = 0
+        start = time.perf_counter()
+        for _ in range(count):
+            puzzle, _ = generator.generate_puzzle(difficulty)
+            blanks += sum(row.count(0) for row in puzzle)
+        elapsed = time.perf_counter() - start
+        # التحقق من الوحدانية خارج التوقيت
+        assert BitmaskSolver(puzzle).count_solutions() == 1
+        print(f"{difficulty:7s} {count / elapsed:8.1f} puzzles/s  {elapsed / count * 1000:7.2f} ms/puzzle  avg blanks {blanks / count:.1f}")
+
+
+if __name__ == '__main__':
+    main()
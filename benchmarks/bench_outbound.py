@@ -0,0 +1,125 @@
+"""اختبار طابور الرسائل الصادرة مقابل خادم محلي يحاكي Bot API
+
+الخادم يرد بـ 429 على نسبة من الطلبات ويسجل وقت كل رسالة، ثم نتحقق من أن كل الرسائل وصلت
+مرتبة لكل محادثة وأن الحدين العام ولكل محادثة لم يُتجاوزا، ونقيس زمن الإضافة إلى الطابور.
+
+الاستخدام: python -m benchmarks.bench_outbound [الرسائل] [المحادثات] [نسبة 429]
+"""
+import asyncio
+import json
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs
+
+from telegram import Bot
+
+from dispatcher import OutboundDispatcher
+
+TOKEN = '123456:stub-token'
+GLOBAL_RATE = 25.0
+GLOBAL_BURST = 5
+CHAT_RATE = 1.0
+CHAT_BURST = 3
+
+
+class StubBotAPI(BaseHTTPRequestHandler):
+    flood_ratio = 0.0
+    log = []
+    floods = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        method = self.path.rsplit('/', 1)[-1]
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0)).decode()
+        if self.headers.get('Content-Type', '').startswith('application/json'):
+            params = json.loads(body or '{}')
+        else:
+            params = {k: v[0] for k, v in parse_qs(body).items()}
+        if method == 'getMe':
+            result = {'id': 123456, 'is_bot': True, 'first_name': 'Stub', 'username': 'stub_bot'}
+        elif random.random() < self.flood_ratio:
+            with self.lock:
+                StubBotAPI.floods += 1
+            return self._reply(429, {'ok': False, 'error_code': 429, 'description': 'Too Many Requests: retry after 1',
+                                     'parameters': {'retry_after': 1}})
+        else:
+            with self.lock:
+                self.log.append((time.monotonic(), int(params['chat_id']), params.get('text')))
+            result = {'message_id': len(self.log), 'date': int(time.time()), 'text': params.get('text'),
+                      'chat': {'id': int(params['chat_id']), 'type': 'private'}}
+        self._reply(200, {'ok': True, 'result': result})
+
+    def _reply(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def max_in_window(times, window):
+    """أكبر عدد أحداث في أي نافذة طولها window ثانية"""
+    times = sorted(times)
+    best = start = 0
+    for end in range(len(times)):
+        while times[end] - times[start] > window:
+            start += 1
+        best = max(best, end - start + 1)
+    return best
+
+
+async def drive(port, messages, chats):
+    bot = Bot(TOKEN, base_url=f'http://127.0.0.1:{port}/bot')
+    outbox = OutboundDispatcher(bot, global_rate=GLOBAL_RATE, global_burst=GLOBAL_BURST,
+                                chat_rate=CHAT_RATE, chat_burst=CHAT_BURST)
+    async with bot:
+        enqueue = []
+        for i in range(messages):
+            start = time.perf_counter()
+            outbox.send(1000 + i % chats, text=f'msg {i}')
+            enqueue.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        await outbox.close(timeout=300)
+        return time.perf_counter() - start, enqueue
+
+
+def main():
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    chats = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    StubBotAPI.flood_ratio = float(sys.argv[3]) if len(sys.argv) > 3 else 0.05
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubBotAPI)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        elapsed, enqueue = asyncio.run(drive(server.server_address[1], messages, chats))
+    finally:
+        server.shutdown()
+
+    log = StubBotAPI.log
+    per_chat = defaultdict(list)
+    for at, chat_id, text in log:
+        per_chat[chat_id].append((at, text))
+    delivered = sum(len(v) for v in per_chat.values())
+    in_order = all([int(t.split()[1]) for _, t in v] == sorted(int(t.split()[1]) for _, t in v) for v in per_chat.values())
+    global_peak = max_in_window([at for at, _, _ in log], 1.0)
+    chat_peak = max(max_in_window([at for at, _ in v], 1.0) for v in per_chat.values())
+
+    print(f"enqueue: {sum(enqueue) / len(enqueue) * 1e6:.1f} us avg, {max(enqueue) * 1e6:.1f} us max")
+    print(f"delivered {delivered}/{messages} user messages in {elapsed:.2f}s, {StubBotAPI.floods} x 429 retried")
+    print(f"peak 1s window: global {global_peak} (limit {GLOBAL_RATE:.0f} + burst {GLOBAL_BURST}), per chat {chat_peak} (limit {CHAT_RATE:.0f} + burst {CHAT_BURST})")
+    ok = (delivered == messages and in_order and global_peak <= GLOBAL_BURST + GLOBAL_RATE + 1
+          and chat_peak <= CHAT_BURST + CHAT_RATE + 1)
+    print("OK" if ok else "FAIL")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""قياس استعلامات الإدارة والمستخدم قبل الفهارس وبعدها على بيانات مولدة
+
+تحذير: يحذف الفهارس ويضيف ملايين الصفوف، فاستخدم قاعدة بيانات محلية مخصصة لذلك فقط.
+الاستخدام: BENCH_DATABASE_URL=postgresql://localhost/sudoku_bench python -m benchmarks.bench_queries [عدد الألعاب]
+"""
+import os
+import sys
+import time
+
+from database import Database, QUERY_INDEXES
+
+QUERIES = {
+    'pending charges': ("SELECT * FROM charge_requests WHERE status = 'pending' ORDER BY created_at LIMIT 50", ()),
+    'user games': ('SELECT * FROM games WHERE user_id = %s ORDER BY created_at DESC LIMIT 20', (4242,)),
+    'recent completed': ("SELECT * FROM games WHERE status = 'completed' ORDER BY completed_at DESC LIMIT 50", ()),
+    'user charges': ('SELECT * FROM charge_requests WHERE user_id = %s', (4242,)),
+}
+
+def seed(db, games, users=100000):
+    with db.get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute('SELECT count(*) FROM games')
+            if cursor.fetchone()[0] >= games:
+                return
+            print(f"Seeding {users} users, {games} games, {games // 10} charge requests...")
+            cursor.execute('''INSERT INTO users (telegram_id, username, points)
+                              SELECT 800000000 + g, 'bench' || g, 100 FROM generate_series(1, %s) g
+                              ON CONFLICT (telegram_id) DO NOTHING''', (users,))
+            cursor.execute('SELECT min(id), max(id) FROM users')
+            lo, hi = cursor.fetchone()
+            cursor.execute('''INSERT INTO games (user_id, difficulty, puzzle_data, solution_data, status, created_at, completed_at)
+                              SELECT %s + (random() * (%s - %s))::int,
+                                     (ARRAY['easy','medium','hard','expert'])[1 + (g %% 4)],
+                                     repeat('0', 81), repeat('1', 81),
+                                     CASE WHEN g %% 3 = 0 THEN 'completed' ELSE 'playing' END,
+                                     now() - (g || ' seconds')::interval,
+                                     CASE WHEN g %% 3 = 0 THEN now() - (g || ' seconds')::interval + interval '5 minutes' END
+                              FROM generate_series(1, %s) g''', (lo, hi, lo, games))
+            cursor.execute('''INSERT INTO charge_requests (user_id, amount_ls, points, status, created_at)
+                              SELECT %s + (random() * (%s - %s))::int, 100, 1000,
+                                     CASE WHEN g %% 50 = 0 THEN 'pending' ELSE 'approved' END,
+                                     now() - (g || ' seconds')::interval
+                              FROM generate_series(1, %s) g''', (lo, hi, lo, games // 10))
+            conn.commit()
+            cursor.execute('ANALYZE')
+            conn.commit()
+
+
+def set_indexes(db, enabled):
+    if enabled:
+        db.create_query_indexes()
+    with db.get_connection() as conn:
+        with conn.cursor() as cursor:
+            if not enabled:
+                for name, _ in QUERY_INDEXES:
+                    cursor.execute(f'DROP INDEX IF EXISTS {name}')
+            cursor.execute('ANALYZE')
+            conn.commit()
+
+
+def measure(db, label, repeat=20):
+    print(f"\n=== {label} ===")
+    with db.get_connection() as conn:
+        with conn.cursor() as cursor:
+            for name, (sql, params) in QUERIES.items():
+                cursor.execute('EXPLAIN (ANALYZE, BUFFERS) ' + sql, params)
+                plan = [row[0] for row in cursor.fetchall()]
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    cursor.execute(sql, params)
+                    cursor.fetchall()
+                ms = (time.perf_counter() - start) / repeat * 1000
+                print(f"{name:18s} {ms:8.2f} ms   {plan[0].strip()}")
+                for line in plan[1:]:
+                    print(f"{'':21s}{line}")
+
+
+def main():
+    games = int(sys.argv[1]) if len(sys.argv) > 1 else 3000000
+    db = Database(os.environ['BENCH_DATABASE_URL'])
+    seed(db, games)
+    set_indexes(db, False)
+    measure(db, 'before indexes')
+    set_indexes(db, True)
+    measure(db, 'after indexes')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""تشغيل عدة عمليات على نفس دلو الحد للتأكد من أن الحالة مشتركة فعلاً وقياس سرعة الفحص
+
+الاستخدام: BENCH_DATABASE_URL=postgresql://localhost/sudoku_bench python -m benchmarks.bench_rate_limit [العمليات] [الطلبات لكل عملية]
+"""
+import multiprocessing
+import os
+import sys
+import time
+import uuid
+
+from database import Database
+from rate_limit import RateLimiter
+
+RATE = 5.0
+CAPACITY = 20
+
+
+def worker(args):
+    key, requests = args
+    db = Database(os.environ['BENCH_DATABASE_URL'], minconn=1, maxconn=1)
+    limiter = RateLimiter(db, {'bench': (RATE, CAPACITY)})
+    allowed = sum(limiter.allow('bench', key) for _ in range(requests))
+    db.pool.closeall()
+    return allowed
+
+
+def main():
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    # إنشاء الجدول مرة واحدة قبل تشغيل العمليات
+    Database(os.environ['BENCH_DATABASE_URL']).pool.closeall()
+    key = uuid.uuid4().hex
+    start = time.perf_counter()
+    with multiprocessing.Pool(processes) as pool:
+        allowed = sum(pool.map(worker, [(key, requests)] * processes))
+    elapsed = time.perf_counter() - start
+    total = processes * requests
+    ceiling = CAPACITY + RATE * elapsed
+    print(f"{total} checks from {processes} processes in {elapsed:.2f}s ({total / elapsed:.0f} checks/s)")
+    print(f"allowed {allowed}, ceiling {ceiling:.1f} (capacity {CAPACITY} + {RATE}/s x elapsed)")
+    if allowed > ceiling:
+        print("FAIL: processes are not sharing the bucket")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""مقارنة سرعة توليد لوحة كاملة عشوائية: التراجع القديم مقابل محرك الأقنعة الجديد
+
+الاستخدام: python -m benchmarks.bench_solver [عدد اللوحات]
+"""
+import random
+import sys
+import time
+
+from sudoku import SudokuGenerator
+
+
+class LegacyGenerator(SudokuGenerator):
+    """نسخة من المسار القديم (تراجع بسيط يبدأ من (0,0) في كل استدعاء)"""
+
+    def generate_full_board(self):
+        self.board = [[0 for _ in range(9)] for _ in range(9)]
+        self.solve_board()
+        return self.board
+
+    def solve_board(self):
+        for row in range(9):
+            for col in range(9):
+                if self.board[row][col] == 0:
+                    numbers = list(range(1, 10))
+                    random.shuffle(numbers)
+                    for num in numbers:
+                        if self.is_valid(row, col, num):
+                            self.board[row][col] = num
+                            if self.solve_board():
+                                return True
+                            self.board[row][col] = 0
+                    return False
+        return True
+
+
+def run(generator, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        board = generator.generate_full_board()
+        assert SudokuGenerator.check_solution(board)
+    return time.perf_counter() - start
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    for name, generator in (('legacy', LegacyGenerator()), ('bitmask', SudokuGenerator())):
+        random.seed(1234)
+        elapsed = run(generator, count)
+        print(f"{name:8s} {count} boards in {elapsed:.3f}s -> {count / elapsed:.1f} boards/s, {elapsed / count * 1000:.3f} ms/board")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""زمن الإقلاع البارد: استيراد app في عملية جديدة، والزمن حتى أول استجابة من الخادم
+
+لا يحتاج قاعدة بيانات ولا تيليجرام: الاستيراد لا يتصل بشيء ومهام الإقلاع معطلة (RUN_STARTUP_TASKS=0).
+الاستخدام: python -m benchmarks.bench_startup [عدد التشغيلات]
+"""
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _env(**extra):
+    env = dict(os.environ, RUN_STARTUP_TASKS='0', PYTHONWARNINGS='ignore', **extra)
+    env.setdefault('BOT_TOKEN', '123456:bench-token')
+    return env
+
+
+def import_seconds():
+    """زمن import app في مفسر جديد (بدون زمن إقلاع المفسر نفسه)"""
+    code = "import time; t = time.perf_counter(); import app; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=_env(), check=True,
+                         capture_output=True, text=True).stdout
+    return float(out.strip().splitlines()[-1])
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def first_response_seconds(timeout=30.0):
+    """من تشغيل python app.py حتى أول استجابة 200 على /"""
+    port = _free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, 'app.py'], cwd=ROOT, env=_env(PORT=str(port)),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError("server did not respond")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    imports = [import_seconds() for _ in range(runs)]
+    firsts = [first_response_seconds() for _ in range(runs)]
+    print(f"import app:     median {statistics.median(imports) * 1000:7.1f} ms  (min {min(imports) * 1000:.1f})")
+    print(f"first response: median {statistics.median(firsts) * 1000:7.1f} ms  (min {min(firsts) * 1000:.1f})")
+
+
+if __name__ == '__main__':
+    main()
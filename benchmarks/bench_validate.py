@@ -0,0 +1,50 @@
+"""عدد اللوحات المتحقق منها في الثانية: NumPy الدفعي مقابل SudokuGenerator.check_solution
+
+الاستخدام: python -m benchmarks.bench_validate [عدد اللوحات]
+"""
+import random
+import sys
+import time
+
+import numpy as np
+
+from batch_validate import validate_boards, compare_solutions
+from sudoku import SudokuGenerator
+
+
+def make_boards(n, rng):
+    base = np.array(SudokuGenerator().generate_full_board(), dtype=np.int8)
+    # إعادة ترقيم الأرقام عشوائياً تعطي لوحات صحيحة مختلفة بسرعة
+    perms = np.array([rng.permutation(9) + 1 for _ in range(n)], dtype=np.int8)
+    boards = np.take_along_axis(perms[:, None, :], (base - 1).reshape(1, 1, 81).repeat(n, axis=0), axis=2)
+    boards = boards.reshape(n, 9, 9)
+    solutions = boards.copy()
+    # إفساد ربع اللوحات بتبديل خليتين
+    bad = rng.random(n) < 0.25
+    boards[bad, 0, 0], boards[bad, 0, 1] = boards[bad, 0, 1], boards[bad, 0, 0].copy()
+    return boards, solutions, bad
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    random.seed(1234)
+    rng = np.random.default_rng(1234)
+    boards, solutions, bad = make_boards(n, rng)
+
+    start = time.perf_counter()
+    valid = validate_boards(boards)
+    _, matches = compare_solutions(boards, solutions)
+    elapsed = time.perf_counter() - start
+    assert (valid == ~bad).all() and (matches == ~bad).all()
+    print(f"numpy   {n / elapsed:12.0f} boards/s")
+
+    sample = boards[:min(n, 20000)].tolist()
+    start = time.perf_counter()
+    for board in sample:
+        SudokuGenerator.check_solution(board)
+    elapsed = time.perf_counter() - start
+    print(f"python  {len(sample) / elapsed:12.0f} boards/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+"""مجموعة قياسات قابلة للتكرار للمولد وقاعدة البيانات ومسارات HTTP مع مقارنة بخط أساس
+
+أمثلة:
+    python -m benchmarks.run --suite generator -o results.json
+    BENCH_DATABASE_URL=postgresql://localhost/sudoku_bench python -m benchmarks.run -o results.json
+    python -m benchmarks.run --suite generator --compare baseline.json --threshold 0.15
+    python -m benchmarks.run --suite startup -o startup.json
+
+مجموعتا db وhttp تحتاجان BENCH_DATABASE_URL (قاعدة بيانات محلية مخصصة للقياس) وتُتخطيان بدونه.
+كل النتائج بوحدة عمليات في الثانية (الأعلى أفضل).
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+
+from sudoku import SudokuGenerator, make_puzzle_id, derive_puzzle
+
+DIFFICULTIES = ['easy', 'medium', 'hard', 'expert']
+BENCH_TELEGRAM_ID = 900000002
+
+
+def throughput(fn, min_time=1.0, min_runs=5):
+    """تكرار fn حتى min_time ثانية وإرجاع عدد الاستدعاءات في الثانية"""
+    runs = 0
+    start = time.perf_counter()
+    while True:
+        fn()
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time and runs >= min_runs:
+            return runs / elapsed
+
+
+def bench_generator(seed, min_time):
+    results = {}
+    generator = SudokuGenerator()
+    for difficulty in DIFFICULTIES:
+        # بذور متتالية: نفس تسلسل الألغاز في كل تشغيل
+        seeds = itertools.count(seed)
+        results[f'generate_puzzle.{difficulty}'] = throughput(lambda: generator.generate_puzzle(difficulty, seed=next(seeds)), min_time)
+    random.seed(seed)
+    puzzle, solution = generator.generate_puzzle('medium')
+    results['check_solution'] = throughput(lambda: SudokuGenerator.check_solution(solution), min_time)
+    results['get_hint'] = throughput(lambda: generator.get_hint(puzzle, solution), min_time)
+    # لغز مشتق بتحويل تماثل من لغز أساس (PUZZLE_SOURCE=transform)
+    base_id = make_puzzle_id('hard', seed)
+    transform_seeds = itertools.count(seed)
+    results['derive_puzzle'] = throughput(lambda: derive_puzzle(base_id, next(transform_seeds)), min_time)
+    return results
+
+
+def bench_db(seed, min_time):
+    from database import Database
+    db = Database(os.environ['BENCH_DATABASE_URL'])
+    random.seed(seed)
+    db.create_user(BENCH_TELEGRAM_ID, 'bench', 'Bench')
+    user = db.get_user_by_telegram_id(BENCH_TELEGRAM_ID)
+    db.add_points(user['id'], 10 ** 9, reason='benchmark')
+    puzzle, solution = SudokuGenerator().generate_puzzle('easy')
+    game_id = db.save_game(user['id'], 'easy', puzzle, solution)
+
+    # تعطيل الذاكرة المؤقتة حتى تقيس كل قراءة قاعدة البيانات فعلاً
+    db.user_cache.ttl = 0
+    db.game_cache.ttl = 0
+    results = {
+        'get_user_by_telegram_id': throughput(lambda: db.get_user_by_telegram_id(BENCH_TELEGRAM_ID), min_time),
+        'get_game': throughput(lambda: db.get_game(game_id), min_time),
+        'add_points': throughput(lambda: db.add_points(user['id'], 1), min_time),
+        'deduct_points': throughput(lambda: db.deduct_points(user['id'], 1), min_time),
+        'save_game': throughput(lambda: db.save_game(user['id'], 'easy', puzzle, solution), min_time),
+        'start_game': throughput(lambda: db.start_game(BENCH_TELEGRAM_ID, 1, 'easy', puzzle, solution), min_time),
+        'increment_hints': throughput(lambda: db.increment_hints(game_id), min_time),
+    }
+    db.user_cache.ttl = 30
+    results['get_user_by_telegram_id.cached'] = throughput(lambda: db.get_user_by_telegram_id(BENCH_TELEGRAM_ID), min_time)
+    return results
+
+
+def bench_http(seed, min_time):
+    # بوت وهمي: رمز شكلي ولا webhook، فلا يخرج أي طلب إلى تيليجرام
+    os.environ['DATABASE_URL'] = os.environ['BENCH_DATABASE_URL']
+    os.environ.setdefault('BOT_TOKEN', '123456:bench-token')
+    os.environ.setdefault('PLAY_BURST', '1000000000')
+    os.environ.setdefault('CHECK_BURST', '1000000000')
+    import app as app_module
+    client = app_module.app.test_client()
+    db = app_module.db
+    random.seed(seed)
+    db.create_user(BENCH_TELEGRAM_ID, 'bench', 'Bench')
+    user = db.get_user_by_telegram_id(BENCH_TELEGRAM_ID)
+    db.add_points(user['id'], 10 ** 9, reason='benchmark')
+
+    def play():
+        response = client.get(f'/play?user={BENCH_TELEGRAM_ID}&difficulty=easy')
+        assert response.status_code == 200
+
+    puzzle, solution = SudokuGenerator().generate_puzzle('easy')
+    started = db.start_game(BENCH_TELEGRAM_ID, 0, 'easy', puzzle, solution)
+
+    def check_wrong():
+        response = client.post('/check_solution', json={'game_id': started[0], 'tg_id': BENCH_TELEGRAM_ID, 'board': puzzle})
+        assert response.status_code == 200
+
+    results = {
+        'play': throughput(play, min_time),
+        'check_solution.wrong': throughput(check_wrong, min_time),
+    }
+    app_module.puzzle_pool.stop(timeout=5)
+    return results
+
+
+def bench_startup(seed, min_time):
+    # عمليات إقلاع كاملة في الثانية (مقلوب الزمن الوسيط) حتى تبقى "الأعلى أفضل"
+    from benchmarks.bench_startup import import_seconds, first_response_seconds
+    results = {}
+    for name, measure in (('import_app', import_seconds), ('first_response', first_response_seconds)):
+        samples = [measure() for _ in range(5)]
+        results[name] = 1 / statistics.median(samples)
+    return results
+
+
+SUITES = {'generator': bench_generator, 'db': bench_db, 'http': bench_http, 'startup': bench_startup}
+
+
+def compare(results, baseline, threshold):
+    """طباعة الفروق وإرجاع قائمة القياسات التي تراجعت بأكثر من threshold"""
+    regressions = []
+    for name, value in sorted(results['metrics'].items()):
+        base = baseline.get('metrics', {}).get(name)
+        if not base:
+            print(f"  {name:40s} {value:12.1f}   (no baseline)")
+            continue
+        change = (value - base) / base
+        flag = ''
+        if change < -threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print(f"  {name:40s} {value:12.1f}   {change:+7.1%} vs {base:.1f}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run seeded benchmarks and compare with a baseline")
+    parser.add_argument('--suite', default='generator,db,http,startup', help="comma-separated: generator,db,http,startup")
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--min-time', type=float, default=1.0, help="seconds per measurement")
+    parser.add_argument('-o', '--output', help="write results JSON here")
+    parser.add_argument('--compare', help="baseline JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=0.10, help="allowed slowdown before flagging")
+    args = parser.parse_args(argv)
+
+    results = {
+        'seed': args.seed,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'metrics': {},
+    }
+    for suite in args.suite.split(','):
+        if suite in ('db', 'http') and not os.environ.get('BENCH_DATABASE_URL'):
+            print(f"Skipping {suite}: BENCH_DATABASE_URL is not set")
+            continue
+        print(f"Running {suite}...")
+        for name, value in SUITES[suite](args.seed, args.min_time).items():
+            results['metrics'][f'{suite}.{name}'] = value
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+    else:
+        for name, value in sorted(results['metrics'].items()):
+            print(f"  {name:40s} {value:12.1f} ops/s")
+
+
+if __name__ == '__main__':
+    main()
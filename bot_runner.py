@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import threading
+import time
+
+from telegram import Update
+
+from metrics import BOT_QUEUE_SECONDS, BOT_UPDATE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class BotRunner:
+    """حلقة أحداث واحدة طويلة العمر في خيط مخصص لمعالجة تحديثات تيليجرام
+
+    submit() تُستدعى من خيوط Flask وتسلّم التحديث للحلقة عبر run_coroutine_threadsafe.
+    عدد التحديثات المعلقة محدود بـ max_pending، وعند امتلائه ترفض submit() بدل إنشاء خيوط بلا حد.
+    بدل application يمكن تمرير factory تبني التطبيق عند أول تحديث فقط.
+    on_shutdown: دالة async تُنفَّذ على الحلقة قبل إيقاف التطبيق (مثل تفريغ الرسائل الصادرة).
+    """
+
+    def __init__(self, application=None, max_pending=1000, factory=None, on_shutdown=None):
+        if application is None and factory is None:
+            raise ValueError("application or factory is required")
+        self.application = application
+        self.factory = factory
+        self.on_shutdown = on_shutdown
+        self.max_pending = max_pending
+        self.loop = None
+        self._thread = None
+        self._pending = 0
+        self._cond = threading.Condition()
+        self._start_lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """تشغيل الحلقة وتهيئة التطبيق مرة واحدة (آمن للاستدعاء المتكرر)"""
+        with self._start_lock:
+            if self.running:
+                return
+            if self.application is None:
+                self.application = self.factory()
+            self.loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._run_loop, name='bot-loop', daemon=True)
+            self._thread.start()
+            try:
+                self.run(self.application.initialize())
+            except Exception:
+                self._stop_loop()
+                raise
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def _stop_loop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+        self._thread = None
+
+    def run(self, coro, timeout=None):
+        """تنفيذ coroutine على حلقة البوت وانتظار نتيجتها من خيط آخر"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def submit(self, update_data):
+        """جدولة معالجة التحديث، تعيد False إذا كان الطابور ممتلئاً"""
+        self.start()
+        with self._cond:
+            if self._pending >= self.max_pending:
+                return False
+            self._pending += 1
+        asyncio.run_coroutine_threadsafe(self._process(update_data, time.perf_counter()), self.loop)
+        return True
+
+    async def _process(self, update_data, received_at):
+        started = time.perf_counter()
+        BOT_QUEUE_SECONDS.observe(started - received_at)
+        try:
+            update = Update.de_json(update_data, self.application.bot)
+            await self.application.process_update(update)
+        except Exception as e:
+            logger.error(f"Error processing update: {e}")
+        finally:
+            BOT_UPDATE_SECONDS.observe(time.perf_counter() - started)
+            with self._cond:
+                self._pending -= 1
+                self._cond.notify_all()
+
+    def pending(self):
+        with self._cond:
+            return self._pending
+
+    def shutdown(self, timeout=30.0):
+        """انتظار تفريغ التحديثات المعلقة ثم إيقاف التطبيق والحلقة"""
+        if not self.running:
+            return
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._pending == 0, timeout):
+                logger.warning(f"Shutting down with {self._pending} updates still pending")
+        try:
+            if self.on_shutdown:
+                self.run(self.on_shutdown(), timeout)
+            self.run(self.application.shutdown(), timeout)
+        except Exception as e:
+            logger.error(f"Error shutting down bot application: {e}")
+        self._stop_loop()
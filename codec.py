@@ -0,0 +1,34 @@
+"""ترميز مضغوط للوحات 9x9
+
+الصيغة المخزنة في قاعدة البيانات نص من 81 رقماً (الصفر = خلية فارغة) بدل JSON للقوائم المتداخلة.
+pack_grid/unpack_grid تحزم نفس اللوحة في 41 بايت (4 بتات لكل خلية) عند الحاجة لـ BYTEA.
+"""
+import json
+
+# تحويل محارف '0'-'9' إلى البايتات 0-9 دفعة واحدة
+_DIGITS_TO_BYTES = bytes.maketrans(b'0123456789', bytes(range(10)))
+
+
+def encode_grid(grid):
+    return ''.join(str(num) for row in grid for num in row)
+
+
+def decode_grid(data):
+    """فك نص من 81 رقماً، مع قبول صيغة JSON القديمة للصفوف التي لم تُرحَّل بعد"""
+    if data.startswith('['):
+        return json.loads(data)
+    raw = data.encode('ascii').translate(_DIGITS_TO_BYTES)
+    return [list(raw[i:i + 9]) for i in range(0, 81, 9)]
+
+
+def pack_grid(grid):
+    flat = [num for row in grid for num in row] + [0]
+    return bytes((flat[i] << 4) | flat[i + 1] for i in range(0, 82, 2))
+
+
+def unpack_grid(data):
+    flat = []
+    for byte in data:
+        flat.append(byte >> 4)
+        flat.append(byte & 0x0F)
+    return [flat[i:i + 9] for i in range(0, 81, 9)]
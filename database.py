@@ -1,35 +1,255 @@
 import psycopg2
-from psycopg2.extras import RealDictCursor
+import psycopg2.extensions
+from psycopg2.extras import RealDictCursor, execute_values
+from psycopg2.pool import PoolError
 import os
-import json
 import logging
+import asyncio
+import functools
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from contextlib import contextmanager
+from codec import encode_grid, decode_grid
+from cache import LRUCache
+from metrics import timed_query
+from sudoku import ALGORITHM_VERSION, puzzle_from_id, remember_puzzle, regenerate_many, can_regenerate
 
 logger = logging.getLogger(__name__)
 
+# مفتاح pg_advisory_lock حتى لا يطبق أكثر من عامل الترحيلات في نفس الوقت
+MIGRATION_LOCK_ID = 727001
+
+# مكافأة الفوز لكل مستوى، وتُستخدم أيضاً لحساب النقاط المكتسبة عند إعادة بناء الإحصاءات من الألعاب القديمة
+REWARDS = {'easy': 500, 'medium': 1000, 'hard': 1500, 'expert': 5000}
+
+# صف إضافي لكل مستخدم في user_stats يجمع كل المستويات
+ALL_DIFFICULTIES = 'all'
+
+# فهارس الاستعلامات الساخنة: (الاسم، ما بعد ON)، تُبنى دون قفل الكتابة في games أثناء النشر
+QUERY_INDEXES = [
+    ('idx_games_user_created', 'games (user_id, created_at DESC)'),
+    ('idx_games_completed_at', "games (completed_at DESC) WHERE status = 'completed'"),
+    ('idx_charge_requests_user', 'charge_requests (user_id)'),
+    ('idx_charge_requests_pending', "charge_requests (created_at) WHERE status = 'pending'"),
+]
+
+# الترحيلات المرقمة: (الإصدار، الوصف، قائمة أوامر SQL أو اسم دالة في Database)
+MIGRATIONS = [
+    (1, 'compact grid encoding', 'migrate_grid_encoding'),
+    (2, 'indexes for per-user, pending and recent queries', 'create_query_indexes'),
+    # UNLOGGED: عدادات الحدود لا تحتاج الحفظ في WAL وفقدانها بعد انهيار لا يضر
+    (3, 'rate limit buckets', [
+        '''CREATE UNLOGGED TABLE IF NOT EXISTS rate_limits (
+            key TEXT PRIMARY KEY,
+            tokens DOUBLE PRECISION NOT NULL,
+            updated_at TIMESTAMPTZ NOT NULL,
+            allowed BOOLEAN NOT NULL)''',
+    ]),
+    # الألعاب الجديدة تخزن معرّف اللغز فقط وتُعاد الشبكتان منه عند الحاجة
+    (4, 'puzzle ids', [
+        'ALTER TABLE games ADD COLUMN IF NOT EXISTS puzzle_id TEXT',
+    ]),
+    # ملخص لكل (مستخدم، مستوى) يُحدَّث داخل معاملتي بدء اللعبة والفوز بدل تجميع games عند كل قراءة.
+    # ملء الملخص من الألعاب السابقة يقفل user_stats طوال القراءة، لذا لا يعمل عند الإقلاع
+    # بل مرة واحدة يدوياً: python leaderboard.py backfill
+    (5, 'per-user stats summary', [
+        '''CREATE TABLE IF NOT EXISTS user_stats (
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            difficulty TEXT NOT NULL,
+            games_started INTEGER NOT NULL DEFAULT 0,
+            wins INTEGER NOT NULL DEFAULT 0,
+            points_earned BIGINT NOT NULL DEFAULT 0,
+            solve_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, difficulty))''',
+        'CREATE INDEX IF NOT EXISTS idx_user_stats_leaderboard ON user_stats (difficulty, points_earned DESC)',
+    ]),
+]
+
+
+class ConnectionPool:
+    """مجمع اتصالات آمن للخيوط مع فحص صحة الاتصال عند السحب وإحصائيات للمراقبة"""
+
+    def __init__(self, dsn, minconn=1, maxconn=10, timeout=30.0, check_after=30.0, prefill=True):
+        if not 0 <= minconn <= maxconn or maxconn < 1:
+            raise ValueError("expected 0 <= minconn <= maxconn and maxconn >= 1")
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        # الاتصال الخامل لأكثر من check_after ثانية يُفحص بـ SELECT 1 قبل تسليمه
+        self.check_after = check_after
+        self._idle = deque()
+        self._cond = threading.Condition()
+        self._total = 0
+        self._in_use = 0
+        self._created = 0
+        self._discarded = 0
+        self._checkouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        # بدون prefill تُفتح الاتصالات عند أول طلب فقط
+        for _ in range(minconn if prefill else 0):
+            conn = self._connect()
+            with self._cond:
+                self._total += 1
+                self._idle.append((conn, time.monotonic()))
+
+    def _connect(self):
+        # الاتصال بـ PostgreSQL مع تفعيل SSL للأمان
+        conn = psycopg2.connect(self.dsn)
+        with self._cond:
+            self._created += 1
+        return conn
+
+    def _healthy(self, conn, idle_since):
+        if conn.closed or conn.info.transaction_status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        if time.monotonic() - idle_since < self.check_after:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def getconn(self):
+        start = time.monotonic()
+        deadline = start + self.timeout
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn, idle_since = self._idle.pop()
+                    break
+                if self._total < self.maxconn:
+                    conn, idle_since = None, None
+                    self._total += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolError("connection pool exhausted")
+                self._cond.wait(remaining)
+            self._in_use += 1
+            waited = time.monotonic() - start
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+
+        try:
+            if conn is not None and not self._healthy(conn, idle_since):
+                logger.warning("Discarding unhealthy pooled connection")
+                self._close(conn)
+                with self._cond:
+                    self._discarded += 1
+                conn = None
+            if conn is None:
+                conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._total -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        return conn
+
+    def putconn(self, conn, discard=False):
+        if not discard and not conn.closed:
+            status = conn.info.transaction_status
+            if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+                discard = True
+            elif status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    discard = True
+        discard = discard or conn.closed
+        if discard:
+            self._close(conn)
+        with self._cond:
+            self._in_use -= 1
+            if discard:
+                self._total -= 1
+                self._discarded += 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def closeall(self):
+        with self._cond:
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._close(conn)
+                self._total -= 1
+
+    def stats(self):
+        with self._cond:
+            return {
+                'size': self._total,
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'created': self._created,
+                'discarded': self._discarded,
+                'checkouts': self._checkouts,
+                'wait_total_seconds': self._wait_total,
+                'wait_max_seconds': self._wait_max,
+                'wait_avg_seconds': self._wait_total / self._checkouts if self._checkouts else 0.0,
+            }
+
+
 class Database:
-    def __init__(self, db_url=None):
+    def __init__(self, db_url=None, minconn=None, maxconn=None, lazy=False):
+        """lazy=True: لا اتصال ولا DDL عند الإنشاء (للإقلاع السريع)، والمخطط يُهيأ مرة واحدة عبر startup.py"""
         self.db_url = db_url or os.environ.get('DATABASE_URL')
-        self._init_db()
+        self.pool = ConnectionPool(
+            self.db_url,
+            minconn=minconn if minconn is not None else int(os.environ.get('DB_POOL_MIN', '1')),
+            maxconn=maxconn if maxconn is not None else int(os.environ.get('DB_POOL_MAX', '10')),
+            prefill=not lazy,
+        )
+        # المستخدمون مفتاحهم telegram_id والألعاب مفتاحها id؛ كل كتابة تُبطل المدخل المعني
+        self.user_cache = LRUCache(maxsize=int(os.environ.get('USER_CACHE_SIZE', '10000')),
+                                   ttl=float(os.environ.get('USER_CACHE_TTL', '30')))
+        self.game_cache = LRUCache(maxsize=int(os.environ.get('GAME_CACHE_SIZE', '10000')),
+                                   ttl=float(os.environ.get('GAME_CACHE_TTL', '900')))
+        if not lazy:
+            self.init_schema()
     
     @contextmanager
     def get_connection(self):
-        conn = None
+        conn = self.pool.getconn()
+        broken = False
         try:
-            # الاتصال بـ PostgreSQL مع تفعيل SSL للأمان
-            conn = psycopg2.connect(self.db_url)
             yield conn
         except Exception as e:
             logger.error(f"Database error: {e}")
-            if conn:
-                conn.rollback()
+            # أخطاء الشبكة تعني أن الاتصال لم يعد صالحاً، فلا يعاد إلى المجمع
+            broken = isinstance(e, (psycopg2.OperationalError, psycopg2.InterfaceError))
+            if not broken:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    broken = True
             raise
         finally:
-            if conn:
-                conn.close()
+            self.pool.putconn(conn, discard=broken)
+
+    def pool_stats(self):
+        return self.pool.stats()
+
+    def cache_stats(self):
+        return {'users': self.user_cache.stats(), 'games': self.game_cache.stats()}
     
-    def _init_db(self):
+    def init_schema(self):
         with self.get_connection() as conn:
             with conn.cursor() as cursor:
                 # جدول المستخدمين
@@ -68,15 +288,196 @@ class Database:
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     completed_at TIMESTAMP)''')
                 
+                cursor.execute('''CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version INTEGER PRIMARY KEY,
+                    name TEXT,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+                
                 conn.commit()
+        self.run_migrations()
 
-    def get_user_by_telegram_id(self, telegram_id):
+    def run_migrations(self):
+        """تطبيق الترحيلات التي لم تُسجَّل في schema_migrations بالترتيب، آمن للتكرار وبين العمليات
+
+        الترحيلات المكتوبة كدوال تعمل على نفس الاتصال الذي يحمل القفل، فيكفي اتصال واحد في المجمع.
+        """
+        applied = []
+        with self.get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_lock(%s)', (MIGRATION_LOCK_ID,))
+                try:
+                    cursor.execute('SELECT version FROM schema_migrations')
+                    done = {row[0] for row in cursor.fetchall()}
+                    conn.commit()
+                    for version, name, steps in MIGRATIONS:
+                        if version in done:
+                            continue
+                        if isinstance(steps, str):
+                            getattr(self, steps)(conn)
+                        else:
+                            for sql in steps:
+                                cursor.execute(sql)
+                        cursor.execute('INSERT INTO schema_migrations (version, name) VALUES (%s, %s)', (version, name))
+                        conn.commit()
+                        applied.append(version)
+                        logger.info(f"Applied migration {version}: {name}")
+                finally:
+                    conn.rollback()
+                    cursor.execute('SELECT pg_advisory_unlock(%s)', (MIGRATION_LOCK_ID,))
+                    conn.commit()
+        return applied
+
+    def migrate_grid_encoding(self, conn=None, batch_size=5000):
+        """تحويل الألعاب المخزنة بصيغة JSON إلى نص الـ81 رقماً على دفعات، آمن للتكرار
+
+        conn اتصال قائم (مثل اتصال run_migrations)، وبدونه يُستعار اتصال من المجمع.
+        """
+        if conn is None:
+            with self.get_connection() as conn:
+                return self.migrate_grid_encoding(conn, batch_size)
+        migrated = 0
+        last_id = 0
+        while True:
+            with conn.cursor() as cursor:
+                # التقدم بالمعرّف بدل إعادة فحص الصفوف المحوّلة من بداية الجدول في كل دفعة
+                cursor.execute('SELECT max(id) FROM (SELECT id FROM games WHERE id > %s ORDER BY id LIMIT %s) AS batch',
+                               (last_id, batch_size))
+                batch_end = cursor.fetchone()[0]
+                if batch_end is None:
+                    break
+                # حذف الأقواس والفواصل والمسافات من JSON القوائم يترك الأرقام الـ81 بالترتيب
+                cursor.execute(
+                    '''UPDATE games
+                       SET puzzle_data = translate(puzzle_data, '[], ', ''),
+                           solution_data = translate(solution_data, '[], ', '')
+                       WHERE id > %s AND id <= %s AND puzzle_data LIKE '[%%' ''',
+                    (last_id, batch_end)
+                )
+                migrated += cursor.rowcount
+                conn.commit()
+            last_id = batch_end
+        if migrated:
+            logger.info(f"Migrated {migrated} games to compact grid encoding")
+        return migrated
+
+    def materialize_puzzle_grids(self, conn=None, batch_size=2000, pool=None):
+        """كتابة الشبكتين في صفوف الألعاب المخزنة بمعرّف لغز فقط، على دفعات بالمعرّف، آمن للتكرار
+
+        يُشغَّل بالإصدار الحالي من المولد قبل نشر رفع ALGORITHM_VERSION، فتبقى الألعاب المنتهية قابلة للقراءة والتحقق.
+        """
+        if conn is None:
+            with self.get_connection() as conn:
+                return self.materialize_puzzle_grids(conn, batch_size, pool)
+        written = 0
+        last_id = 0
+        while True:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    '''SELECT id, puzzle_id FROM games WHERE id > %s AND puzzle_id IS NOT NULL AND puzzle_data IS NULL
+                       ORDER BY id LIMIT %s''', (last_id, batch_size))
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                grids = regenerate_many([puzzle_id for _, puzzle_id in rows if can_regenerate(puzzle_id)], pool)
+                values = [(game_id, encode_grid(grids[puzzle_id][0]), encode_grid(grids[puzzle_id][1]))
+                          for game_id, puzzle_id in rows if puzzle_id in grids]
+                execute_values(
+                    cursor,
+                    '''UPDATE games SET puzzle_data = v.puzzle_data, solution_data = v.solution_data
+                       FROM (VALUES %s) AS v(id, puzzle_data, solution_data) WHERE games.id = v.id''',
+                    values, page_size=batch_size)
+                conn.commit()
+                written += len(values)
+                skipped = len(rows) - len(values)
+                if skipped:
+                    logger.warning(f"{skipped} games have puzzle ids from another algorithm version, left as they are")
+            last_id = rows[-1][0]
+        logger.info(f"Materialized grids for {written} games")
+        return written
+
+    def create_query_indexes(self, conn=None):
+        """بناء QUERY_INDEXES بـ CREATE INDEX CONCURRENTLY حتى لا تُقفل الكتابة أثناء البناء، آمن للتكرار
+
+        البناء المتزامن لا يعمل داخل معاملة فيعمل الاتصال بوضع autocommit مؤقتاً (قفل الترحيلات قفل جلسة
+        فيبقى محمولاً). فهرس بقي غير صالح بعد بناء فاشل يُحذف ويُعاد بناؤه بدل أن يتخطاه IF NOT EXISTS.
+        """
+        if conn is None:
+            with self.get_connection() as conn:
+                return self.create_query_indexes(conn)
+        conn.commit()
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cursor:
+                for name, definition in QUERY_INDEXES:
+                    cursor.execute('SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = %s',
+                                   (name,))
+                    row = cursor.fetchone()
+                    if row and row[0]:
+                        continue
+                    if row:
+                        cursor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+                    cursor.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}')
+                    logger.info(f"Built index {name}")
+        finally:
+            conn.autocommit = False
+
+    def backfill_user_stats(self, conn=None, batch_size=5000):
+        """إعادة بناء user_stats من games بقراءة متدفقة بمؤشر مسمى، آمن للتكرار
+
+        الجدول مقفل أمام بدء الألعاب وإنهائها حتى الاستبدال، فلا تُحسب لعبة مرتين ولا تضيع.
+        النقاط المكتسبة تُحسب من REWARDS الحالية لأن المكافأة لا تُخزن مع اللعبة.
+        """
+        if conn is None:
+            with self.get_connection() as conn:
+                return self.backfill_user_stats(conn, batch_size)
+        totals = {}
+        with conn.cursor() as cursor:
+            cursor.execute('LOCK TABLE user_stats IN SHARE ROW EXCLUSIVE MODE')
+            with conn.cursor(name='backfill_user_stats') as games:
+                games.itersize = batch_size
+                games.execute(
+                    '''SELECT user_id, difficulty, status = 'completed',
+                              EXTRACT(EPOCH FROM completed_at - created_at)
+                       FROM games WHERE user_id IS NOT NULL'''
+                )
+                for user_id, difficulty, won, seconds in games:
+                    for key in ((user_id, difficulty), (user_id, ALL_DIFFICULTIES)):
+                        row = totals.get(key)
+                        if row is None:
+                            row = totals[key] = [0, 0, 0, 0.0]
+                        row[0] += 1
+                        if won:
+                            row[1] += 1
+                            row[2] += REWARDS.get(difficulty, 0)
+                            row[3] += float(seconds or 0)
+            cursor.execute('DELETE FROM user_stats')
+            execute_values(
+                cursor,
+                '''INSERT INTO user_stats (user_id, difficulty, games_started, wins, points_earned, solve_seconds)
+                   VALUES %s''',
+                [(user_id, difficulty, *row) for (user_id, difficulty), row in totals.items()],
+                page_size=batch_size,
+            )
+            conn.commit()
+        logger.info(f"Backfilled {len(totals)} user_stats rows")
+        return len(totals)
+
+    @timed_query
+    def get_user_by_telegram_id(self, telegram_id, fresh=False):
+        """fresh=True يتجاوز الذاكرة المؤقتة (لكل فحص يحرك نقاطاً، فالنسخة المخزنة قد تكون قديمة بين العمال)"""
+        cached = None if fresh else self.user_cache.get(telegram_id)
+        if cached is not None:
+            return dict(cached)
         with self.get_connection() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cursor:
                 cursor.execute('SELECT * FROM users WHERE telegram_id = %s', (telegram_id,))
                 res = cursor.fetchone()
-                return dict(res) if res else None
+                if not res:
+                    return None
+                self.user_cache.set(telegram_id, dict(res))
+                return dict(res)
 
+    @timed_query
     def create_user(self, telegram_id, username, first_name):
         with self.get_connection() as conn:
             with conn.cursor() as cursor:
@@ -85,23 +486,33 @@ class Database:
                     (telegram_id, username, first_name)
                 )
                 conn.commit()
+        self.user_cache.invalidate(telegram_id)
 
     # ✅ دالة إضافة النقاط (تُستخدم عند الفوز أو عند قبول الشحن)
+    @timed_query
     def add_points(self, user_id, amount, reason=""):
         with self.get_connection() as conn:
             with conn.cursor() as cursor:
-                cursor.execute('UPDATE users SET points = points + %s WHERE id = %s', (amount, user_id))
+                cursor.execute('UPDATE users SET points = points + %s WHERE id = %s RETURNING telegram_id', (amount, user_id))
+                res = cursor.fetchone()
                 conn.commit()
                 logger.info(f"Added {amount} points to user {user_id}. Reason: {reason}")
+        if res:
+            self.user_cache.invalidate(res[0])
 
+    @timed_query
     def deduct_points(self, user_id, amount):
         with self.get_connection() as conn:
             with conn.cursor() as cursor:
-                cursor.execute('UPDATE users SET points = points - %s WHERE id = %s AND points >= %s', (amount, user_id, amount))
+                cursor.execute('UPDATE users SET points = points - %s WHERE id = %s AND points >= %s RETURNING telegram_id', (amount, user_id, amount))
+                res = cursor.fetchone()
                 conn.commit()
-                return cursor.rowcount > 0
+        if res:
+            self.user_cache.invalidate(res[0])
+        return res is not None
 
     # ✅ دالة إنشاء طلب شحن (التي يستدعيها ملف app.py)
+    @timed_query
     def create_charge_request(self, user_id, amount_ls, points, method, sender_phone, trans_id):
         with self.get_connection() as conn:
             with conn.cursor() as cursor:
@@ -112,30 +523,213 @@ class Database:
                 conn.commit()
                 return rid
 
+    @timed_query
     def save_game(self, user_id, difficulty, puzzle, solution):
         with self.get_connection() as conn:
             with conn.cursor() as cursor:
                 cursor.execute(
                     'INSERT INTO games (user_id, difficulty, puzzle_data, solution_data) VALUES (%s, %s, %s, %s) RETURNING id',
-                    (user_id, difficulty, json.dumps(puzzle), json.dumps(solution))
+                    (user_id, difficulty, encode_grid(puzzle), encode_grid(solution))
                 )
                 gid = cursor.fetchone()[0]
                 conn.commit()
-                return gid
+        self.game_cache.invalidate(gid)
+        return gid
+
+    @timed_query
+    def start_game(self, telegram_id, cost, difficulty, puzzle, solution, puzzle_id=None):
+        """خصم تكلفة اللعبة وحفظها في استعلام واحد، يعيد (game_id, new_points) أو None إذا لم يكفِ الرصيد
+
+        الشبكتان تُخزنان مع puzzle_id حتى تنتهي اللعبة (complete_game يحذفهما)، فلا يكسر رفع إصدار المولد
+        لعبة جارية. اللعبة الجديدة تُخزن مؤقتاً بالشبكتين الموجودتين في اليد حتى لا يعيد أول /move
+        أو /check_solution قراءتها.
+        """
+        puzzle_data, solution_data = encode_grid(puzzle), encode_grid(solution)
+        with self.get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                cursor.execute(
+                    '''WITH charged AS (
+                           UPDATE users SET points = points - %s
+                           WHERE telegram_id = %s AND points >= %s
+                           RETURNING id, points),
+                       counted AS (
+                           INSERT INTO user_stats (user_id, difficulty, games_started)
+                           SELECT id, d, 1 FROM charged, (VALUES (%s), (%s)) AS v(d)
+                           ON CONFLICT (user_id, difficulty) DO UPDATE SET games_started = user_stats.games_started + 1)
+                       INSERT INTO games (user_id, difficulty, puzzle_data, solution_data, puzzle_id)
+                       SELECT id, %s, %s, %s, %s FROM charged
+                       RETURNING *, (SELECT points FROM charged) AS new_points''',
+                    (cost, telegram_id, cost, difficulty, ALL_DIFFICULTIES, difficulty, puzzle_data, solution_data, puzzle_id)
+                )
+                res = cursor.fetchone()
+                conn.commit()
+        self.user_cache.invalidate(telegram_id)
+        if not res:
+            return None
+        game = dict(res)
+        new_points = game.pop('new_points')
+        game['puzzle'] = [row[:] for row in puzzle]
+        game['solution'] = [row[:] for row in solution]
+        self.game_cache.set(game['id'], game)
+        if puzzle_id:
+            remember_puzzle(puzzle_id, puzzle, solution)
+        return game['id'], new_points
+
+    @timed_query
+    def complete_game(self, game_id, reward):
+        """إنهاء اللعبة وإضافة المكافأة وتحديث user_stats مرة واحدة فقط
+
+        يعيد {'points', 'user_id', 'telegram_id', 'first_name', 'points_earned'} أو None إذا سبق إنهاؤها،
+        وpoints_earned هو مجموع ما كسبه اللاعب في كل المستويات بعد هذا الفوز.
+        """
+        with self.get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    '''WITH done AS (
+                           UPDATE games SET status = 'completed', completed_at = CURRENT_TIMESTAMP,
+                               -- اللعبة المنتهية يكفيها المعرّف إذا كان الإصدار الحالي يعيد بناءه
+                               puzzle_data = CASE WHEN puzzle_id LIKE %s THEN NULL ELSE puzzle_data END,
+                               solution_data = CASE WHEN puzzle_id LIKE %s THEN NULL ELSE solution_data END
+                           WHERE id = %s AND status = 'playing'
+                           RETURNING user_id, difficulty, EXTRACT(EPOCH FROM completed_at - created_at) AS seconds),
+                       stats AS (
+                           INSERT INTO user_stats (user_id, difficulty, wins, points_earned, solve_seconds)
+                           SELECT user_id, d, 1, %s, seconds FROM done, LATERAL (VALUES (done.difficulty), (%s)) AS v(d)
+                           ON CONFLICT (user_id, difficulty) DO UPDATE SET
+                               wins = user_stats.wins + 1,
+                               points_earned = user_stats.points_earned + EXCLUDED.points_earned,
+                               solve_seconds = user_stats.solve_seconds + EXCLUDED.solve_seconds
+                           RETURNING difficulty, points_earned)
+                       UPDATE users SET points = points + %s
+                       FROM done WHERE users.id = done.user_id
+                       RETURNING users.points, users.id, users.telegram_id, users.first_name,
+                                 (SELECT points_earned FROM stats WHERE difficulty = %s)''',
+                    (f'{ALGORITHM_VERSION}:%', f'{ALGORITHM_VERSION}:%', game_id, reward, ALL_DIFFICULTIES, reward, ALL_DIFFICULTIES)
+                )
+                res = cursor.fetchone()
+                conn.commit()
+        self.game_cache.invalidate(int(game_id))
+        if not res:
+            return None
+        logger.info(f"Game {game_id} completed, added {reward} points")
+        self.user_cache.invalidate(res[2])
+        return {'points': res[0], 'user_id': res[1], 'telegram_id': res[2], 'first_name': res[3], 'points_earned': res[4]}
+
+    @timed_query
+    def get_user_stats(self, user_id):
+        """إحصاءات اللاعب لكل مستوى وللمجموع ('all') من صفوف user_stats بالمفتاح الأساسي"""
+        with self.get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                cursor.execute(
+                    'SELECT difficulty, games_started, wins, points_earned, solve_seconds FROM user_stats WHERE user_id = %s',
+                    (user_id,)
+                )
+                stats = {}
+                for row in cursor.fetchall():
+                    row = dict(row)
+                    row['avg_solve_seconds'] = row['solve_seconds'] / row['wins'] if row['wins'] else None
+                    stats[row.pop('difficulty')] = row
+                return stats
+
+    @timed_query
+    def get_top_players(self, limit=100, difficulty=ALL_DIFFICULTIES):
+        """أعلى اللاعبين نقاطاً مكتسبة عبر فهرس idx_user_stats_leaderboard"""
+        with self.get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                cursor.execute(
+                    '''SELECT s.user_id, u.first_name, s.points_earned, s.wins
+                       FROM user_stats s JOIN users u ON u.id = s.user_id
+                       WHERE s.difficulty = %s
+                       ORDER BY s.points_earned DESC LIMIT %s''',
+                    (difficulty, limit)
+                )
+                return [dict(r) for r in cursor.fetchall()]
+
+    @timed_query
+    def get_pending_charge_requests(self, limit=50):
+        with self.get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                cursor.execute("SELECT * FROM charge_requests WHERE status = 'pending' ORDER BY created_at LIMIT %s", (limit,))
+                return [dict(r) for r in cursor.fetchall()]
+
+    @timed_query
+    def get_user_games(self, user_id, limit=20):
+        with self.get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                cursor.execute(
+                    'SELECT id, difficulty, hints_used, status, created_at, completed_at FROM games WHERE user_id = %s ORDER BY created_at DESC LIMIT %s',
+                    (user_id, limit)
+                )
+                return [dict(r) for r in cursor.fetchall()]
+
+    @timed_query
+    def get_recent_completed_games(self, limit=50):
+        with self.get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                cursor.execute(
+                    "SELECT id, user_id, difficulty, hints_used, created_at, completed_at FROM games WHERE status = 'completed' ORDER BY completed_at DESC LIMIT %s",
+                    (limit,)
+                )
+                return [dict(r) for r in cursor.fetchall()]
 
+    @timed_query
     def get_game(self, game_id):
+        game_id = int(game_id)
+        cached = self.game_cache.get(game_id)
+        if cached is not None:
+            return dict(cached)
         with self.get_connection() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cursor:
                 cursor.execute('SELECT * FROM games WHERE id = %s', (game_id,))
                 res = cursor.fetchone()
                 if res:
                     res = dict(res)
-                    res['puzzle'] = json.loads(res['puzzle_data'])
-                    res['solution'] = json.loads(res['solution_data'])
+                    if res.get('puzzle_id') and not res['puzzle_data']:
+                        if can_regenerate(res['puzzle_id']):
+                            res['puzzle'], res['solution'] = puzzle_from_id(res['puzzle_id'])
+                        else:
+                            # لعبة منتهية من إصدار مولد سابق لم تُكتب شبكاتها قبل الرفع
+                            logger.warning(f"Game {game_id} puzzle {res['puzzle_id']} cannot be rebuilt by this version")
+                            res['puzzle'] = res['solution'] = None
+                    else:
+                        res['puzzle'] = decode_grid(res['puzzle_data'])
+                        res['solution'] = decode_grid(res['solution_data'])
+                    # تُخزَّن الألعاب الجارية فقط، فالمنتهية نادراً ما تُقرأ مجدداً
+                    if res['status'] == 'playing':
+                        self.game_cache.set(game_id, dict(res))
                 return res
 
+    @timed_query
     def increment_hints(self, game_id):
         with self.get_connection() as conn:
             with conn.cursor() as cursor:
                 cursor.execute('UPDATE games SET hints_used = hints_used + 1 WHERE id = %s', (game_id,))
                 conn.commit()
+        self.game_cache.invalidate(int(game_id))
+
+
+class AsyncDatabase:
+    """واجهة غير متزامنة بنفس أسماء دوال Database تنفذ الاستعلامات في مجمع خيوط
+
+    عدد الخيوط يساوي الحد الأقصى لمجمع الاتصالات حتى لا تنتظر الخيوط اتصالاً غير متاح.
+    """
+
+    def __init__(self, db, max_workers=None):
+        self.db = db
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or db.pool.maxconn, thread_name_prefix='db')
+
+    def __getattr__(self, name):
+        method = getattr(self.db, name)
+        if not callable(method):
+            return method
+
+        @functools.wraps(method)
+        async def wrapper(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(method, *args, **kwargs))
+
+        setattr(self, name, wrapper)
+        return wrapper
+
+    def close(self):
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,160 @@
+"""طابور الرسائل الصادرة إلى تيليجرام
+
+المعالجات تضيف الرسالة وتعود فوراً، والإرسال الفعلي يجري في مهام على حلقة البوت مع احترام
+حدود تيليجرام: حد عام لكل البوت وحد لكل محادثة، وإعادة المحاولة بعد 429 (RetryAfter) وأخطاء الشبكة.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+
+from telegram.error import RetryAfter, BadRequest, Forbidden, NetworkError, TelegramError
+
+from metrics import OUTBOUND_MESSAGES, OUTBOUND_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """دلو رموز في الذاكرة لحلقة أحداث واحدة (بدون أقفال)"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self):
+        """استهلاك رمز، تعيد 0 عند النجاح أو عدد الثواني حتى يتوفر رمز"""
+        self.refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def pause(self, seconds):
+        """منع أي رمز قبل مرور seconds ثانية (بدون تراكم إذا تكرر الإيقاف)"""
+        self.refill()
+        self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+    async def acquire(self):
+        while True:
+            wait = self.take()
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+
+def _retry_seconds(error):
+    retry_after = error.retry_after
+    return retry_after.total_seconds() if hasattr(retry_after, 'total_seconds') else float(retry_after)
+
+
+class OutboundDispatcher:
+    """إرسال غير حاجب مرتب لكل محادثة، بمهمة واحدة لكل محادثة فيها رسائل معلقة
+
+    يُستدعى send() من داخل حلقة البوت. bot يُضبط عند بناء تطبيق البوت.
+    """
+
+    def __init__(self, bot=None, global_rate=25.0, global_burst=5, chat_rate=1.0, chat_burst=3,
+                 max_pending=10000, max_retries=5, backoff=1.0):
+        self.bot = bot
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._queues = {}
+        self._buckets = {}
+        self._tasks = {}
+        self._pending = 0
+
+    def pending(self):
+        return self._pending
+
+    def send(self, chat_id, method='send_message', **kwargs):
+        """جدولة getattr(bot, method)(chat_id=chat_id, **kwargs)، تعيد False إذا كان الطابور ممتلئاً"""
+        if self._pending >= self.max_pending:
+            OUTBOUND_MESSAGES.inc(result='dropped')
+            logger.error(f"Outbound queue full, dropping {method} to {chat_id}")
+            return False
+        self._pending += 1
+        self._queues.setdefault(chat_id, deque()).append((method, kwargs, time.perf_counter()))
+        if chat_id not in self._tasks:
+            self._tasks[chat_id] = asyncio.get_running_loop().create_task(self._drain(chat_id))
+        return True
+
+    async def _drain(self, chat_id):
+        queue = self._queues[chat_id]
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        try:
+            while queue:
+                method, kwargs, queued_at = queue[0]
+                await self._deliver(chat_id, bucket, method, kwargs)
+                queue.popleft()
+                self._pending -= 1
+                OUTBOUND_SECONDS.observe(time.perf_counter() - queued_at)
+        finally:
+            del self._tasks[chat_id]
+            del self._queues[chat_id]
+            # يبقى دلو المحادثة حتى يمتلئ من جديد ثم يُحذف، حتى لا تكبر الذاكرة مع كل محادثة
+            bucket.refill()
+            refill_seconds = (bucket.capacity - bucket.tokens) / bucket.rate
+            asyncio.get_running_loop().call_later(refill_seconds, self._forget_bucket, chat_id, bucket)
+
+    def _forget_bucket(self, chat_id, bucket):
+        if chat_id not in self._tasks and self._buckets.get(chat_id) is bucket:
+            del self._buckets[chat_id]
+
+    async def _deliver(self, chat_id, bucket, method, kwargs):
+        for attempt in range(self.max_retries + 1):
+            await bucket.acquire()
+            await self.global_bucket.acquire()
+            try:
+                await getattr(self.bot, method)(chat_id=chat_id, **kwargs)
+                OUTBOUND_MESSAGES.inc(result='sent')
+                return
+            except RetryAfter as e:
+                wait = _retry_seconds(e)
+                # 429 يعني أن البوت كله تجاوز الحد، فيتوقف الإرسال لكل المحادثات لا لهذه وحدها
+                self.global_bucket.pause(wait)
+                logger.warning(f"Flood limit hit sending to {chat_id}, pausing all sends for {wait}s")
+            except (BadRequest, Forbidden) as e:
+                # BadRequest فرع من NetworkError في PTB 20، فيُلتقط قبله: مثل هذه الأخطاء لن تنجح بإعادة المحاولة
+                OUTBOUND_MESSAGES.inc(result='failed')
+                logger.error(f"Dropping {method} to {chat_id}: {e}")
+                return
+            except NetworkError as e:
+                wait = min(self.backoff * 2 ** attempt, 60)
+                logger.warning(f"Network error sending {method} to {chat_id}: {e}, retrying in {wait}s")
+            except TelegramError as e:
+                # بقية أخطاء Bot API (مثل ChatMigrated وInvalidToken) لا تُعاد كذلك
+                OUTBOUND_MESSAGES.inc(result='failed')
+                logger.error(f"Dropping {method} to {chat_id}: {e}")
+                return
+            except Exception as e:
+                OUTBOUND_MESSAGES.inc(result='failed')
+                logger.error(f"Unexpected error sending {method} to {chat_id}: {e}")
+                return
+            OUTBOUND_MESSAGES.inc(result='retried')
+            await asyncio.sleep(wait)
+        OUTBOUND_MESSAGES.inc(result='failed')
+        logger.error(f"Giving up on {method} to {chat_id} after {self.max_retries} retries")
+
+    async def close(self, timeout=30.0):
+        """انتظار تفريغ كل الطوابير"""
+        tasks = list(self._tasks.values())
+        if tasks:
+            done, not_done = await asyncio.wait(tasks, timeout=timeout)
+            if not_done:
+                logger.warning(f"Closing with {self._pending} outbound messages still queued")
+                for task in not_done:
+                    task.cancel()
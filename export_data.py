@@ -0,0 +1,140 @@
+"""تصدير واستيراد جداول users وgames وcharge_requests بشكل متدفق بذاكرة ثابتة
+
+أمثلة:
+    python export_data.py export games -o games.jsonl.gz
+    python export_data.py export users --format csv -o users.csv
+    python export_data.py import games -i games.jsonl.gz
+"""
+import argparse
+import csv
+import gzip
+import io
+import json
+import logging
+import sys
+from datetime import date, datetime
+
+from database import Database
+
+logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TABLES = ('users', 'games', 'charge_requests')
+BATCH_SIZE = 5000
+
+
+def _open(path, mode):
+    if path == '-':
+        return sys.stdout if 'w' in mode else sys.stdin
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8', newline='')
+    return open(path, mode, encoding='utf-8', newline='')
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def export_table(db, table, out, fmt='jsonl'):
+    """كتابة الجدول صفاً صفاً: COPY مباشرة لـ CSV ومؤشر على الخادم لـ JSON Lines"""
+    count = 0
+    with db.get_connection() as conn:
+        if fmt == 'csv':
+            with conn.cursor() as cursor:
+                cursor.copy_expert(f'COPY (SELECT * FROM {table} ORDER BY id) TO STDOUT WITH CSV HEADER', out)
+                count = cursor.rowcount
+        else:
+            with conn.cursor(name=f'export_{table}') as cursor:
+                cursor.itersize = BATCH_SIZE
+                cursor.execute(f'SELECT * FROM {table} ORDER BY id')
+                columns = None
+                for row in cursor:
+                    if columns is None:
+                        columns = [col.name for col in cursor.description]
+                    out.write(json.dumps(dict(zip(columns, row)), default=_json_default, ensure_ascii=False) + '\n')
+                    count += 1
+    return count
+
+
+# NULL صريح غير مقتبس، وكل قيمة أخرى مقتبسة حتى يبقى النص الفارغ نصاً فارغاً بعد COPY
+COPY_CSV_NULL = r'\N'
+
+
+def _csv_field(value):
+    if value is None:
+        return COPY_CSV_NULL
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def _jsonl_to_csv(lines, columns):
+    """تحويل دفعة من أسطر JSON إلى CSV في الذاكرة لتغذية COPY FROM ... NULL '\\N'"""
+    buf = io.StringIO()
+    for line in lines:
+        record = json.loads(line)
+        buf.write(','.join(_csv_field(record.get(c)) for c in columns) + '\n')
+    buf.seek(0)
+    return buf
+
+
+def import_table(db, table, inp, fmt='jsonl'):
+    """تحميل الملف إلى الجدول عبر COPY FROM على دفعات ثم ضبط تسلسل id"""
+    count = 0
+    with db.get_connection() as conn:
+        with conn.cursor() as cursor:
+            if fmt == 'csv':
+                header = next(csv.reader([inp.readline()]))
+                cursor.copy_expert(f'COPY {table} ({", ".join(header)}) FROM STDIN WITH CSV', inp)
+                count = cursor.rowcount
+            else:
+                columns = None
+                batch = []
+                for line in inp:
+                    if not line.strip():
+                        continue
+                    if columns is None:
+                        columns = list(json.loads(line).keys())
+                    batch.append(line)
+                    if len(batch) >= BATCH_SIZE:
+                        cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH CSV NULL '{COPY_CSV_NULL}'", _jsonl_to_csv(batch, columns))
+                        count += len(batch)
+                        batch = []
+                if batch:
+                    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH CSV NULL '{COPY_CSV_NULL}'", _jsonl_to_csv(batch, columns))
+                    count += len(batch)
+            cursor.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE(MAX(id), 1)) FROM {table}")
+        conn.commit()
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream tables to/from JSON Lines or CSV")
+    parser.add_argument('action', choices=['export', 'import'])
+    parser.add_argument('table', choices=TABLES)
+    parser.add_argument('--format', choices=['jsonl', 'csv'], default='jsonl')
+    parser.add_argument('-o', '--output', default='-', help="export file (.gz for gzip), '-' for stdout")
+    parser.add_argument('-i', '--input', default='-', help="import file (.gz for gzip), '-' for stdin")
+    args = parser.parse_args(argv)
+
+    db = Database(lazy=True)
+    if args.action == 'export':
+        out = _open(args.output, 'w')
+        try:
+            count = export_table(db, args.table, out, args.format)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        logger.info(f"Exported {count} rows from {args.table}")
+    else:
+        inp = _open(args.input, 'r')
+        try:
+            count = import_table(db, args.table, inp, args.format)
+        finally:
+            if inp is not sys.stdin:
+                inp.close()
+        logger.info(f"Imported {count} rows into {args.table}")
+
+
+if __name__ == '__main__':
+    main()
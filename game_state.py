@@ -0,0 +1,118 @@
+import random
+import threading
+
+from cache import LRUCache
+from solver import ROW_OF, COL_OF, BOX_OF, to_flat
+
+
+class GameState:
+    """حالة لعبة جارية في الذاكرة مع عدادات لكل رقم في كل صف/عمود/مربع
+
+    كل حركة تُحدّث العدادات وعدد التعارضات في O(1)، واكتمال اللوحة يُعرف من عدد الخلايا
+    الممتلئة وعدد التعارضات دون فحص اللوحة كاملة.
+    """
+
+    def __init__(self, game_id, puzzle, solution, hints_used=0, user_id=None):
+        self.game_id = game_id
+        self.user_id = user_id
+        self.cells = to_flat(puzzle)
+        self.solution = to_flat(solution)
+        self.fixed = [num != 0 for num in self.cells]
+        self.hints_used = hints_used
+        # counts[u][d]: عدد مرات ظهور الرقم d في الوحدة u (0-8 صفوف، 9-17 أعمدة، 18-26 مربعات)
+        self.counts = [[0] * 10 for _ in range(27)]
+        self.conflicts = 0
+        self.filled = 0
+        self.lock = threading.Lock()
+        for idx, num in enumerate(self.cells):
+            if num:
+                self._add(idx, num)
+
+    @classmethod
+    def from_game(cls, game):
+        return cls(game['id'], game['puzzle'], game['solution'], game.get('hints_used', 0), game.get('user_id'))
+
+    def _units(self, idx):
+        return ROW_OF[idx], 9 + COL_OF[idx], 18 + BOX_OF[idx]
+
+    def _add(self, idx, num):
+        for u in self._units(idx):
+            if self.counts[u][num]:
+                self.conflicts += 1
+            self.counts[u][num] += 1
+        self.filled += 1
+
+    def _discard(self, idx, num):
+        for u in self._units(idx):
+            self.counts[u][num] -= 1
+            if self.counts[u][num]:
+                self.conflicts -= 1
+        self.filled -= 1
+
+    @property
+    def complete(self):
+        return self.filled == 81 and self.conflicts == 0
+
+    def has_conflict(self, idx):
+        num = self.cells[idx]
+        return bool(num) and any(self.counts[u][num] > 1 for u in self._units(idx))
+
+    def move(self, row, col, value):
+        """وضع رقم (أو 0 للمسح) في خلية غير ثابتة، يرفع ValueError للحركات غير الصالحة"""
+        if not (0 <= row < 9 and 0 <= col < 9 and 0 <= value <= 9):
+            raise ValueError("Move out of range")
+        idx = row * 9 + col
+        if self.fixed[idx]:
+            raise ValueError("Cell is fixed")
+        old = self.cells[idx]
+        if old:
+            self._discard(idx, old)
+        self.cells[idx] = value
+        if value:
+            self._add(idx, value)
+        return {'conflict': self.has_conflict(idx), 'conflicts': self.conflicts, 'complete': self.complete}
+
+    def hint_available(self):
+        return any(not self.fixed[idx] and self.cells[idx] != self.solution[idx] for idx in range(81))
+
+    def hint(self, rng=None):
+        """كشف خلية فارغة أو خاطئة بقيمتها الصحيحة وتثبيتها، يعيد None إذا لم يبقَ ما يُكشف"""
+        candidates = [idx for idx in range(81) if not self.fixed[idx] and self.cells[idx] != self.solution[idx]]
+        if not candidates:
+            return None
+        idx = (rng or random).choice(candidates)
+        if self.cells[idx]:
+            self._discard(idx, self.cells[idx])
+        value = self.solution[idx]
+        self.cells[idx] = value
+        self._add(idx, value)
+        self.fixed[idx] = True
+        self.hints_used += 1
+        return {'row': idx // 9, 'col': idx % 9, 'value': value}
+
+
+class GameStore:
+    """حالات الألعاب الجارية في ذاكرة محدودة، تُحمَّل من قاعدة البيانات عند أول طلب"""
+
+    def __init__(self, db, maxsize=10000, ttl=3600.0):
+        self.db = db
+        self.cache = LRUCache(maxsize=maxsize, ttl=ttl)
+        self._load_lock = threading.Lock()
+
+    def get(self, game_id):
+        game_id = int(game_id)
+        state = self.cache.get(game_id)
+        if state is not None:
+            return state
+        with self._load_lock:
+            state = self.cache.get(game_id)
+            if state is None:
+                game = self.db.get_game(game_id)
+                if not game or game['status'] != 'playing':
+                    return None
+                state = GameState.from_game(game)
+                self.cache.set(game_id, state)
+        return state
+
+    def discard(self, game_id):
+        self.cache.invalidate(int(game_id))
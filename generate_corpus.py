@@ -0,0 +1,48 @@
+"""توليد مجموعة كبيرة من الألغاز مسبقاً وكتابتها إلى ملف JSON Lines
+
+مثال: python generate_corpus.py expert 50000 -o expert.jsonl --workers 8
+"""
+import argparse
+import gzip
+import json
+import logging
+import sys
+import time
+
+from codec import encode_grid
+from sudoku import generate_puzzles
+
+logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-generate Sudoku puzzles in parallel")
+    parser.add_argument('difficulty', choices=['easy', 'medium', 'hard', 'expert'])
+    parser.add_argument('count', type=int)
+    parser.add_argument('-o', '--output', default='-', help="output file (.gz for gzip), '-' for stdout")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    args = parser.parse_args(argv)
+
+    if args.output == '-':
+        out = sys.stdout
+    elif args.output.endswith('.gz'):
+        out = gzip.open(args.output, 'wt', encoding='utf-8')
+    else:
+        out = open(args.output, 'w', encoding='utf-8')
+
+    start = time.perf_counter()
+    try:
+        for i, (puzzle, solution) in enumerate(generate_puzzles(args.difficulty, args.count, workers=args.workers), 1):
+            out.write(json.dumps({'difficulty': args.difficulty, 'puzzle': encode_grid(puzzle), 'solution': encode_grid(solution)}) + '\n')
+            if i % 1000 == 0:
+                logger.info(f"{i}/{args.count} puzzles ({i / (time.perf_counter() - start):.0f}/s)")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - start
+    logger.info(f"Wrote {args.count} {args.difficulty} puzzles in {elapsed:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
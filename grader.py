@@ -0,0 +1,215 @@
+from itertools import combinations
+
+from solver import ALL_DIGITS, POPCOUNT, ROW_UNITS, COL_UNITS, BOX_UNITS, ROW_OF, COL_OF, BOX_OF, iter_bits, to_flat
+
+UNITS = ROW_UNITS + COL_UNITS + BOX_UNITS
+
+# الأقران العشرون لكل خلية (نفس الصف أو العمود أو المربع)
+PEERS = [sorted(set(ROW_UNITS[ROW_OF[i]] + COL_UNITS[COL_OF[i]] + BOX_UNITS[BOX_OF[i]]) - {i}) for i in range(81)]
+
+# رتبة كل تقنية (الأعلى = الأصعب) ووزنها في النتيجة الرقمية لكل مرة تُستخدم فيها
+TECHNIQUES = {
+    'naked_single': (1, 1),
+    'hidden_single': (2, 2),
+    'locked_candidates': (3, 10),
+    'naked_pair': (4, 15),
+    'hidden_pair': (4, 20),
+    'naked_triple': (5, 25),
+    'x_wing': (6, 40),
+    'guess': (7, 100),
+}
+
+# نطاق رتبة أصعب تقنية مطلوبة لكل مستوى
+DIFFICULTY_BANDS = {
+    'easy': (1, 1),
+    'medium': (1, 2),
+    'hard': (2, 5),
+    'expert': (3, 7),
+}
+
+
+class LogicalSolver:
+    """حل منطقي بأسلوب الإنسان يسجل التقنيات المستخدمة لتقييم صعوبة اللغز"""
+
+    def __init__(self, puzzle):
+        self.values = [0] * 81
+        self.cands = [ALL_DIGITS] * 81
+        self.used = {}
+        self.valid = True
+        for idx, num in enumerate(to_flat(puzzle)):
+            if num:
+                self._assign(idx, 1 << (num - 1))
+
+    def _assign(self, idx, bit):
+        if not self.cands[idx] & bit:
+            self.valid = False
+        self.values[idx] = bit
+        self.cands[idx] = 0
+        cands = self.cands
+        for p in PEERS[idx]:
+            cands[p] &= ~bit
+
+    def _eliminate(self, idx, mask):
+        if self.cands[idx] & mask:
+            self.cands[idx] &= ~mask
+            if not self.cands[idx]:
+                self.valid = False
+            return True
+        return False
+
+    def _record(self, technique):
+        self.used[technique] = self.used.get(technique, 0) + 1
+
+    def _naked_single(self):
+        cands = self.cands
+        for idx in range(81):
+            if cands[idx] and POPCOUNT[cands[idx]] == 1:
+                self._assign(idx, cands[idx])
+                return True
+        return False
+
+    def _hidden_single(self):
+        cands = self.cands
+        for unit in UNITS:
+            once = twice = 0
+            for idx in unit:
+                twice |= once & cands[idx]
+                once |= cands[idx]
+            singles = once & ~twice
+            if singles:
+                bit = singles & -singles
+                for idx in unit:
+                    if cands[idx] & bit:
+                        self._assign(idx, bit)
+                        return True
+        return False
+
+    def _locked_candidates(self):
+        cands = self.cands
+        # pointing: رقم محصور داخل المربع في صف أو عمود واحد
+        for box in BOX_UNITS:
+            for bit in iter_bits(self._unit_candidates(box)):
+                cells = [idx for idx in box if cands[idx] & bit]
+                for line_of, lines in ((ROW_OF, ROW_UNITS), (COL_OF, COL_UNITS)):
+                    if len({line_of[idx] for idx in cells}) == 1:
+                        changed = False
+                        for idx in lines[line_of[cells[0]]]:
+                            if idx not in box:
+                                changed |= self._eliminate(idx, bit)
+                        if changed:
+                            return True
+        # claiming: رقم محصور داخل الصف أو العمود في مربع واحد
+        for line in ROW_UNITS + COL_UNITS:
+            for bit in iter_bits(self._unit_candidates(line)):
+                cells = [idx for idx in line if cands[idx] & bit]
+                if len({BOX_OF[idx] for idx in cells}) == 1:
+                    changed = False
+                    for idx in BOX_UNITS[BOX_OF[cells[0]]]:
+                        if idx not in line:
+                            changed |= self._eliminate(idx, bit)
+                    if changed:
+                        return True
+        return False
+
+    def _naked_subset(self, size):
+        cands = self.cands
+        for unit in UNITS:
+            open_cells = [idx for idx in unit if cands[idx] and POPCOUNT[cands[idx]] <= size]
+            for group in combinations(open_cells, size):
+                mask = 0
+                for idx in group:
+                    mask |= cands[idx]
+                if POPCOUNT[mask] != size:
+                    continue
+                changed = False
+                for idx in unit:
+                    if idx not in group:
+                        changed |= self._eliminate(idx, mask)
+                if changed:
+                    return True
+        return False
+
+    def _hidden_pair(self):
+        cands = self.cands
+        for unit in UNITS:
+            positions = {}
+            for bit in iter_bits(self._unit_candidates(unit)):
+                cells = tuple(idx for idx in unit if cands[idx] & bit)
+                if len(cells) == 2:
+                    positions.setdefault(cells, []).append(bit)
+            for cells, bits in positions.items():
+                if len(bits) == 2:
+                    keep = bits[0] | bits[1]
+                    changed = False
+                    for idx in cells:
+                        changed |= self._eliminate(idx, ~keep & ALL_DIGITS)
+                    if changed:
+                        return True
+        return False
+
+    def _x_wing(self):
+        cands = self.cands
+        for bit in (1 << d for d in range(9)):
+            for bases, covers, cover_of in ((ROW_UNITS, COL_UNITS, COL_OF), (COL_UNITS, ROW_UNITS, ROW_OF)):
+                pairs = {}
+                for unit in bases:
+                    cells = [idx for idx in unit if cands[idx] & bit]
+                    if len(cells) == 2:
+                        pairs.setdefault((cover_of[cells[0]], cover_of[cells[1]]), []).append(set(cells))
+                for cover_pair, groups in pairs.items():
+                    if len(groups) < 2:
+                        continue
+                    wing = groups[0] | groups[1]
+                    changed = False
+                    for c in cover_pair:
+                        for idx in covers[c]:
+                            if idx not in wing:
+                                changed |= self._eliminate(idx, bit)
+                    if changed:
+                        return True
+        return False
+
+    def _unit_candidates(self, unit):
+        mask = 0
+        for idx in unit:
+            mask |= self.cands[idx]
+        return mask
+
+    def solve(self):
+        """تطبيق التقنيات من الأسهل للأصعب، والعودة للأسهل بعد كل تقدم"""
+        steps = (
+            ('naked_single', self._naked_single),
+            ('hidden_single', self._hidden_single),
+            ('locked_candidates', self._locked_candidates),
+            ('naked_pair', lambda: self._naked_subset(2)),
+            ('hidden_pair', self._hidden_pair),
+            ('naked_triple', lambda: self._naked_subset(3)),
+            ('x_wing', self._x_wing),
+        )
+        while self.valid and 0 in self.values:
+            for technique, step in steps:
+                if step():
+                    self._record(technique)
+                    break
+            else:
+                self._record('guess')
+                return False
+        return self.valid
+
+
+def grade_puzzle(puzzle):
+    """تقييم اللغز حسب أصعب تقنية يحتاجها، يعيد dict فيه rank وscore وtechnique"""
+    logic = LogicalSolver(puzzle)
+    solved = logic.solve()
+    hardest = max(logic.used, key=lambda t: TECHNIQUES[t][0], default='naked_single')
+    return {
+        'technique': hardest,
+        'rank': TECHNIQUES[hardest][0],
+        'score': sum(TECHNIQUES[t][1] * n for t, n in logic.used.items()),
+        'solved': solved,
+    }
+
+
+def matches_difficulty(grade, difficulty):
+    low, high = DIFFICULTY_BANDS.get(difficulty, (1, 7))
+    return low <= grade['rank'] <= high
@@ -0,0 +1,112 @@
+"""لوحة المتصدرين في الذاكرة وأمر إعادة بناء الإحصاءات
+
+    python leaderboard.py backfill      إعادة بناء user_stats من جدول games
+    python leaderboard.py top [N]       طباعة أفضل N لاعبين
+"""
+import argparse
+import bisect
+import logging
+import threading
+import time
+
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+
+class Leaderboard:
+    """أفضل size لاعبين مرتبين بالنقاط المكتسبة في قائمة مرتبة (bisect)
+
+    تُحمَّل من user_stats بـ refresh() (يستدعيها المستدعي خارج حلقة الأحداث عندما تكون stale)،
+    وrecord() تحدّثها بعد كل فوز في O(log size) بدون انتظار التحديث التالي.
+    top(k) وrank() تقرآن من الذاكرة فقط ولا تلمسان قاعدة البيانات.
+    """
+
+    def __init__(self, db, size=100, ttl=300.0):
+        self.db = db
+        self.size = size
+        self.ttl = ttl
+        self._keys = []      # (-points_earned, user_id) تصاعدياً، أي الأعلى نقاطاً أولاً
+        self._entries = {}   # user_id -> {'user_id', 'first_name', 'points_earned'}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def stale(self):
+        return self._loaded_at is None or time.monotonic() - self._loaded_at >= self.ttl
+
+    def refresh(self):
+        rows = self.db.get_top_players(self.size)
+        with self._lock:
+            self._entries = {r['user_id']: r for r in rows}
+            self._keys = sorted((-r['points_earned'], r['user_id']) for r in rows)
+            self._loaded_at = time.monotonic()
+
+    def ensure_fresh(self):
+        if self.stale:
+            try:
+                self.refresh()
+            except Exception as e:
+                # نعرض آخر نسخة محملة بدل الفشل
+                logger.error(f"Leaderboard refresh failed: {e}")
+
+    def _remove(self, user_id):
+        entry = self._entries.pop(user_id, None)
+        if entry is not None:
+            index = bisect.bisect_left(self._keys, (-entry['points_earned'], user_id))
+            del self._keys[index]
+
+    def record(self, user_id, first_name, points_earned):
+        """تحديث مجموع لاعب بعد فوز، يدخل القائمة فقط إذا تفوق على آخرها"""
+        key = (-points_earned, user_id)
+        with self._lock:
+            self._remove(user_id)
+            if len(self._keys) >= self.size and key >= self._keys[-1]:
+                return
+            bisect.insort(self._keys, key)
+            self._entries[user_id] = {'user_id': user_id, 'first_name': first_name, 'points_earned': points_earned}
+            if len(self._keys) > self.size:
+                _, dropped = self._keys.pop()
+                del self._entries[dropped]
+
+    def top(self, k=10):
+        with self._lock:
+            return [dict(self._entries[user_id]) for _, user_id in self._keys[:k]]
+
+    def rank(self, user_id):
+        """ترتيب اللاعب (يبدأ من 1) إذا كان ضمن أفضل size، وإلا None"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            return bisect.bisect_left(self._keys, (-entry['points_earned'], user_id)) + 1
+
+
+def main(argv=None):
+    from database import Database
+    load_dotenv()
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Rebuild per-user stats or print the leaderboard")
+    sub = parser.add_subparsers(dest='command', required=True)
+    backfill = sub.add_parser('backfill', help="rebuild user_stats by streaming over games")
+    backfill.add_argument('--batch-size', type=int, default=5000)
+    top = sub.add_parser('top', help="print the top players")
+    top.add_argument('count', type=int, nargs='?', default=10)
+    args = parser.parse_args(argv)
+
+    db = Database(minconn=0, maxconn=1, lazy=True)
+    try:
+        if args.command == 'backfill':
+            rows = db.backfill_user_stats(batch_size=args.batch_size)
+            print(f"Rebuilt {rows} user_stats rows")
+        else:
+            board = Leaderboard(db, size=args.count)
+            board.refresh()
+            for position, entry in enumerate(board.top(args.count), 1):
+                print(f"{position:4d}. {entry['first_name'] or entry['user_id']}  {entry['points_earned']}")
+    finally:
+        db.pool.closeall()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+"""قياسات خفيفة (عدادات ومدرجات تكرارية) وعرضها بصيغة Prometheus النصية"""
+import cProfile
+import functools
+import io
+import logging
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _label_str(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in labels) + '}'
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_label_str(key)} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets, counts):
+                    cumulative += n
+                    lines.append(f'{self.name}_bucket{_label_str(key + (("le", bound),))} {cumulative}')
+                lines.append(f'{self.name}_bucket{_label_str(key + (("le", "+Inf"),))} {count}')
+                lines.append(f'{self.name}_sum{_label_str(key)} {total}')
+                lines.append(f'{self.name}_count{_label_str(key)} {count}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help_text):
+        metric = Counter(name, help_text)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, help_text, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_gauges(self, name, help_text, collect):
+        """collect() تعيد أزواج (labels dict, value) وتُستدعى عند كل عرض"""
+        self._collectors.append((name, help_text, collect, 'gauge'))
+
+    def register_counters(self, name, help_text, collect):
+        """مثل register_gauges لمجاميع متزايدة يحتفظ بها كائن آخر، تُعرض بنوع counter"""
+        self._collectors.append((name, help_text, collect, 'counter'))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for name, help_text, collect, kind in self._collectors:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            try:
+                for labels, value in collect():
+                    lines.append(f'{name}{_label_str(tuple(sorted(labels.items())))} {value}')
+            except Exception as e:
+                logger.error(f"Metrics collector {name} failed: {e}")
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+GENERATE_SECONDS = registry.histogram('sudoku_generate_seconds', 'Time spent in generate_puzzle')
+SOLVER_NODES = registry.histogram('sudoku_solver_nodes', 'Search nodes visited by the bitmask solver',
+                                  buckets=(10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 50000))
+DB_SECONDS = registry.histogram('db_query_seconds', 'Latency of Database methods')
+DB_ERRORS = registry.counter('db_errors_total', 'Database method calls that raised')
+BOT_QUEUE_SECONDS = registry.histogram('bot_update_queue_seconds', 'Delay between webhook receipt and processing start')
+BOT_UPDATE_SECONDS = registry.histogram('bot_update_seconds', 'Time spent processing a Telegram update')
+HTTP_SECONDS = registry.histogram('http_request_seconds', 'Flask request latency')
+OUTBOUND_MESSAGES = registry.counter('telegram_outbound_total', 'Outbound Bot API calls by result')
+OUTBOUND_SECONDS = registry.histogram('telegram_outbound_seconds', 'Delay between enqueueing an outbound message and delivery')
+
+
+def timed_query(method):
+    """تسجيل زمن دالة Database في db_query_seconds حسب اسمها"""
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        except Exception:
+            DB_ERRORS.inc(method=method.__name__)
+            raise
+        finally:
+            DB_SECONDS.observe(time.perf_counter() - start, method=method.__name__)
+    return wrapper
+
+
+class SamplingProfiler:
+    """تشغيل cProfile على الطلبات الـN التالية فقط (PROFILE_REQUESTS أو أمر الأدمن /profile)"""
+
+    def __init__(self, remaining=0, top=25):
+        self.remaining = remaining
+        self.top = top
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def arm(self, count):
+        with self._lock:
+            self.remaining = count
+
+    def begin(self):
+        with self._lock:
+            if self.remaining <= 0:
+                return
+            self.remaining -= 1
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # مُحلل آخر يعمل بالفعل في خيط آخر
+            return
+        self._local.profiler = profiler
+
+    def end(self, label):
+        profiler = getattr(self._local, 'profiler', None)
+        if profiler is None:
+            return
+        profiler.disable()
+        self._local.profiler = None
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(self.top)
+        logger.info(f"Profile for {label}:\n{out.getvalue()}")
+
+
+profiler = SamplingProfiler(remaining=int(os.environ.get('PROFILE_REQUESTS', '0')))
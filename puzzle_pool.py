@@ -0,0 +1,163 @@
+import logging
+import random
+import threading
+from collections import deque
+
+from grader import grade_puzzle, matches_difficulty
+from sudoku import generate_with_id, new_seed, make_derived_id, derive_puzzle
+
+logger = logging.getLogger(__name__)
+
+DIFFICULTIES = ('easy', 'medium', 'hard', 'expert')
+
+
+class PuzzlePool:
+    """مخزون ألغاز جاهزة لكل مستوى يعاد ملؤه في خيط خلفي
+
+    عندما ينخفض مخزون مستوى ما تحت low_watermark يملؤه الخيط الخلفي حتى high_watermark.
+    get() تسحب لغزاً جاهزاً (puzzle, solution, puzzle_id) في O(1)، وتولّده مباشرة فقط إذا كان المخزون فارغاً.
+    """
+
+    def __init__(self, difficulties=DIFFICULTIES, high_watermark=20, low_watermark=5, source=generate_with_id):
+        if not 0 <= low_watermark <= high_watermark:
+            raise ValueError("low_watermark must be between 0 and high_watermark")
+        self.high_watermark = high_watermark
+        # source(difficulty) تعيد (puzzle, solution, puzzle_id)
+        self.source = source
+        self.low_watermark = low_watermark
+        self._queues = {d: deque() for d in difficulties}
+        self._hits = {d: 0 for d in difficulties}
+        self._misses = {d: 0 for d in difficulties}
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._thread = None
+
+    def start(self):
+        """تشغيل خيط الملء (آمن للاستدعاء المتكرر وبعد fork)"""
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._worker, name='puzzle-pool', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def get(self, difficulty):
+        """إرجاع (puzzle, solution, puzzle_id) من المخزون أو توليده مباشرة عند نفاده"""
+        queue = self._queues.get(difficulty)
+        if queue is None:
+            return self.source(difficulty)
+        self.start()
+        with self._cond:
+            if queue:
+                item = queue.popleft()
+                self._hits[difficulty] += 1
+            else:
+                item = None
+                self._misses[difficulty] += 1
+            if len(queue) < self.low_watermark:
+                self._cond.notify()
+        if item is None:
+            logger.warning(f"Puzzle pool empty for {difficulty}, generating inline")
+            return self.source(difficulty)
+        return item
+
+    def put_back(self, difficulty, item):
+        """إعادة لغز لم يُستخدم (مثلاً رُفضت اللعبة لقلة الرصيد) إلى مقدمة المخزون"""
+        with self._cond:
+            queue = self._queues.get(difficulty)
+            if queue is not None and len(queue) < self.high_watermark:
+                queue.appendleft(item)
+
+    def stats(self):
+        with self._cond:
+            return {d: {'size': len(self._queues[d]), 'hits': self._hits[d], 'misses': self._misses[d]}
+                    for d in self._queues}
+
+    def _needs_refill(self):
+        return [d for d, q in self._queues.items() if len(q) < self.low_watermark]
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._stopping and not self._needs_refill():
+                    self._cond.wait()
+                if self._stopping:
+                    return
+                pending = self._needs_refill()
+            # مصدر يحتاج تجهيزاً (مثل PuzzleLibrary) يُجهَّز هنا في خيط الملء لا في مسار الطلب
+            prepare = getattr(self.source, 'prepare', None)
+            if prepare is not None:
+                for difficulty in pending:
+                    try:
+                        prepare(difficulty)
+                    except Exception as e:
+                        logger.error(f"Puzzle source preparation error for {difficulty}: {e}")
+            # الملء بالتناوب بين المستويات حتى لا ينتظر مستوى سهل خلف مستوى خبير
+            while pending and not self._stopping:
+                for difficulty in list(pending):
+                    try:
+                        item = self.source(difficulty)
+                    except Exception as e:
+                        logger.error(f"Puzzle pool generation error: {e}")
+                        pending.remove(difficulty)
+                        continue
+                    with self._cond:
+                        queue = self._queues[difficulty]
+                        queue.append(item)
+                        if len(queue) >= self.high_watermark:
+                            pending.remove(difficulty)
+
+
+class PuzzleLibrary:
+    """مكتبة صغيرة من ألغاز أساس مقيّمة لكل مستوى، تُشتق منها ألغاز جديدة بتحويلات التماثل
+
+    التحويل يحافظ على الوحدانية ورتبة الصعوبة، فكل لغز جديد يكلف بضع ميكروثوانٍ بدل توليد كامل.
+    prepare() تبني ألغاز أساس مستوى واحد (يستدعيها خيط PuzzlePool قبل الملء)، وقبل اكتمالها
+    يُولَّد لغز كامل واحد بدل انتظار بناء المكتبة داخل الطلب.
+    """
+
+    def __init__(self, bases_per_difficulty=20):
+        self.bases_per_difficulty = bases_per_difficulty
+        self._bases = {}
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock_for(self, difficulty):
+        with self._locks_guard:
+            return self._locks.setdefault(difficulty, threading.Lock())
+
+    def prepare(self, difficulty):
+        """بناء ألغاز الأساس لمستوى واحد مرة واحدة، بقفل خاص به حتى لا تنتظره المستويات الأخرى"""
+        with self._lock_for(difficulty):
+            if difficulty in self._bases:
+                return self._bases[difficulty]
+            bases, attempts = [], 0
+            while len(bases) < self.bases_per_difficulty and attempts < self.bases_per_difficulty * 10:
+                attempts += 1
+                puzzle, _, puzzle_id = generate_with_id(difficulty)
+                # المولد يعيد آخر محاولة إذا لم يصب المستوى، وأساس خارج المستوى يورّث خطأه لكل مشتقاته
+                if matches_difficulty(grade_puzzle(puzzle), difficulty):
+                    bases.append(puzzle_id)
+            if not bases:
+                logger.error(f"No base puzzle graded as {difficulty} after {attempts} attempts")
+                return bases
+            self._bases[difficulty] = bases
+            logger.info(f"Built {len(bases)} base puzzles for {difficulty} in {attempts} attempts")
+            return bases
+
+    def __call__(self, difficulty):
+        """لغز مشتق جديد: (puzzle, solution, puzzle_id)"""
+        bases = self._bases.get(difficulty)
+        if bases is None:
+            return generate_with_id(difficulty)
+        base_id = random.choice(bases)
+        transform_seed = new_seed()
+        puzzle, solution = derive_puzzle(base_id, transform_seed)
+        return puzzle, solution, make_derived_id(base_id, transform_seed)
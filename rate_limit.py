@@ -0,0 +1,44 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# الرصيد بعد إعادة التعبئة: القديم + الوقت المنقضي × المعدل بحد أقصى capacity
+# (في SET تشير rate_limits.* إلى القيم القديمة، وEXCLUDED.updated_at هو وقت هذا الطلب)
+_REFILL = ("LEAST(%(capacity)s, rate_limits.tokens"
+           " + EXTRACT(EPOCH FROM EXCLUDED.updated_at - rate_limits.updated_at) * %(rate)s)")
+
+TAKE_TOKEN_SQL = f'''INSERT INTO rate_limits (key, tokens, updated_at, allowed)
+    VALUES (%(key)s, %(capacity)s - 1, clock_timestamp(), TRUE)
+    ON CONFLICT (key) DO UPDATE SET
+        tokens = {_REFILL} - CASE WHEN {_REFILL} >= 1 THEN 1 ELSE 0 END,
+        allowed = {_REFILL} >= 1,
+        updated_at = EXCLUDED.updated_at
+    RETURNING allowed'''
+
+
+class RateLimiter:
+    """حدود طلبات لكل مستخدم بخوارزمية token bucket مخزنة في PostgreSQL
+
+    الحالة مشتركة بين كل العمليات (عمال gunicorn) لأن كل فحص أمر UPSERT ذري واحد.
+    limits: {'اسم الحد': (rate بالرموز في الثانية, capacity أقصى رصيد)}
+    """
+
+    def __init__(self, db, limits):
+        self.db = db
+        self.limits = limits
+
+    def allow(self, name, key):
+        """استهلاك رمز من دلو (name, key)، يعيد False إذا تجاوز المستخدم الحد"""
+        rate, capacity = self.limits[name]
+        params = {'key': f"{name}:{key}", 'rate': rate, 'capacity': capacity}
+        try:
+            with self.db.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(TAKE_TOKEN_SQL, params)
+                    allowed = cursor.fetchone()[0]
+                    conn.commit()
+                    return allowed
+        except Exception as e:
+            # لا نمنع اللاعبين بسبب عطل في قاعدة البيانات
+            logger.error(f"Rate limiter error for {params['key']}: {e}")
+            return True
@@ -0,0 +1,210 @@
+import random
+
+# كل رقم 1-9 يمثَّل ببت واحد: الرقم d يقابله البت (1 << (d - 1))
+ALL_DIGITS = 0x1FF
+
+ROW_OF = [i // 9 for i in range(81)]
+COL_OF = [i % 9 for i in range(81)]
+BOX_OF = [(i // 27) * 3 + (i % 9) // 3 for i in range(81)]
+
+# الوحدات الـ27 (صفوف، أعمدة، مربعات) كقوائم من فهارس الخلايا
+ROW_UNITS = [[r * 9 + c for c in range(9)] for r in range(9)]
+COL_UNITS = [[r * 9 + c for r in range(9)] for c in range(9)]
+BOX_UNITS = [[(b // 3) * 27 + (b % 3) * 3 + r * 9 + c for r in range(3) for c in range(3)] for b in range(9)]
+
+POPCOUNT = [bin(mask).count('1') for mask in range(ALL_DIGITS + 1)]
+
+
+def bit_to_digit(bit):
+    return bit.bit_length()
+
+
+def iter_bits(mask):
+    while mask:
+        bit = mask & -mask
+        yield bit
+        mask ^= bit
+
+
+def to_flat(board):
+    return [board[r][c] for r in range(9) for c in range(9)]
+
+
+def to_grid(cells):
+    return [list(cells[r * 9:r * 9 + 9]) for r in range(9)]
+
+
+class BitmaskSolver:
+    """محرك حل يعتمد على أقنعة البتات لكل صف/عمود/مربع مع اختيار الخلية الأكثر تقييداً (MRV)"""
+
+    def __init__(self, board=None, rng=None, hidden_singles=True):
+        self.rng = rng or random
+        # فحص hidden singles مفيد في الألغاز الصعبة لكنه عبء على لوحة فارغة لا يوجد فيها ما يُستنتج
+        self.hidden_singles = hidden_singles
+        self.cells = [0] * 81
+        self.rows = [0] * 9
+        self.cols = [0] * 9
+        self.boxes = [0] * 9
+        self.nodes = 0
+        self.solutions = 0
+        if board is not None:
+            self.load(board)
+
+    def load(self, board):
+        """تحميل لوحة 9x9 (الصفر = خلية فارغة)، يرفع ValueError عند وجود تعارض"""
+        self.cells = [0] * 81
+        self.rows = [0] * 9
+        self.cols = [0] * 9
+        self.boxes = [0] * 9
+        for idx, num in enumerate(to_flat(board)):
+            if num:
+                bit = 1 << (num - 1)
+                if not self.candidates(idx) & bit:
+                    raise ValueError(f"Conflicting value {num} at cell {idx}")
+                self.place(idx, bit)
+
+    def candidates(self, idx):
+        return ALL_DIGITS & ~(self.rows[ROW_OF[idx]] | self.cols[COL_OF[idx]] | self.boxes[BOX_OF[idx]])
+
+    def place(self, idx, bit):
+        self.cells[idx] = bit
+        self.rows[ROW_OF[idx]] |= bit
+        self.cols[COL_OF[idx]] |= bit
+        self.boxes[BOX_OF[idx]] |= bit
+
+    def remove(self, idx):
+        bit = self.cells[idx]
+        self.cells[idx] = 0
+        self.rows[ROW_OF[idx]] ^= bit
+        self.cols[COL_OF[idx]] ^= bit
+        self.boxes[BOX_OF[idx]] ^= bit
+
+    def seed_diagonal_boxes(self):
+        """ملء المربعات القطرية الثلاثة بتباديل عشوائية (مستقلة عن بعضها فلا تحتاج تحققاً)"""
+        for box in (0, 4, 8):
+            bits = [1 << d for d in range(9)]
+            self.rng.shuffle(bits)
+            for idx, bit in zip(BOX_UNITS[box], bits):
+                self.place(idx, bit)
+
+    def _select_cell(self):
+        """اختيار الخلية الفارغة ذات أقل عدد من المرشحين دون بناء جدول المرشحين"""
+        cells, rows, cols, boxes = self.cells, self.rows, self.cols, self.boxes
+        best, best_count, best_cand = None, 10, 0
+        for idx in range(81):
+            if cells[idx]:
+                continue
+            cand = ALL_DIGITS & ~(rows[ROW_OF[idx]] | cols[COL_OF[idx]] | boxes[BOX_OF[idx]])
+            count = POPCOUNT[cand]
+            if count < best_count:
+                if count <= 1:
+                    return (idx, cand) if count else (-1, 0)
+                best, best_count, best_cand = idx, count, cand
+        return best, best_cand
+
+    def _scan(self):
+        """حساب مرشحي كل الخلايا الفارغة مرة واحدة واختيار الخلية الأكثر تقييداً (MRV)
+
+        يعيد (idx, cand, cands) حيث idx يساوي None إذا امتلأت اللوحة و-1 إذا وُجدت خلية بلا مرشحين.
+        """
+        cells, rows, cols, boxes = self.cells, self.rows, self.cols, self.boxes
+        cands = [0] * 81
+        best, best_count, best_cand = None, 10, 0
+        for idx in range(81):
+            if cells[idx]:
+                continue
+            cand = ALL_DIGITS & ~(rows[ROW_OF[idx]] | cols[COL_OF[idx]] | boxes[BOX_OF[idx]])
+            count = POPCOUNT[cand]
+            if count < best_count:
+                if count == 0:
+                    return -1, 0, cands
+                best, best_count, best_cand = idx, count, cand
+            cands[idx] = cand
+        return best, best_cand, cands
+
+    def _hidden_single(self, cands):
+        """البحث عن رقم له مكان واحد فقط داخل وحدة ما، يعيد (idx, bit) أو (None, 0) أو (-1, 0) عند التناقض"""
+        for units, used_masks in ((BOX_UNITS, self.boxes), (ROW_UNITS, self.rows), (COL_UNITS, self.cols)):
+            for u, unit in enumerate(units):
+                once = twice = 0
+                for idx in unit:
+                    cand = cands[idx]
+                    twice |= once & cand
+                    once |= cand
+                if ALL_DIGITS & ~used_masks[u] & ~once:
+                    return -1, 0
+                singles = once & ~twice
+                if singles:
+                    bit = singles & -singles
+                    for idx in unit:
+                        if cands[idx] & bit:
+                            return idx, bit
+        return None, 0
+
+    def _next_move(self):
+        """الخلية التالية ومرشحوها: naked single ثم hidden single ثم MRV"""
+        if not self.hidden_singles:
+            return self._select_cell()
+        idx, cand, cands = self._scan()
+        if idx is None or idx < 0 or POPCOUNT[cand] == 1:
+            return idx, cand
+        hidden, bit = self._hidden_single(cands)
+        if hidden is not None:
+            return hidden, bit
+        return idx, cand
+
+    def _search(self):
+        self.nodes += 1
+        idx, cand = self._next_move()
+        if idx is None:
+            return True
+        if idx < 0:
+            return False
+        bits = list(iter_bits(cand))
+        if len(bits) > 1:
+            self.rng.shuffle(bits)
+        for bit in bits:
+            self.place(idx, bit)
+            if self._search():
+                return True
+            self.remove(idx)
+        return False
+
+    def solve(self):
+        """حل اللوحة في مكانها، يعيد True عند النجاح"""
+        return self._search()
+
+    def _count_search(self, limit):
+        self.nodes += 1
+        idx, cand = self._next_move()
+        if idx is None:
+            self.solutions += 1
+            return self.solutions >= limit
+        if idx < 0:
+            return False
+        for bit in iter_bits(cand):
+            self.place(idx, bit)
+            stop = self._count_search(limit)
+            self.remove(idx)
+            if stop:
+                return True
+        return False
+
+    def count_solutions(self, limit=2):
+        """عدّ الحلول مع التوقف عند الوصول إلى limit، وتبقى اللوحة كما هي بعد الاستدعاء"""
+        self.solutions = 0
+        self._count_search(limit)
+        return self.solutions
+
+    def has_alternative(self, idx, bit):
+        """هل يوجد حل تأخذ فيه الخلية الفارغة idx رقماً غير bit؟"""
+        for other in iter_bits(self.candidates(idx) & ~bit):
+            self.place(idx, other)
+            found = self.count_solutions(limit=1)
+            self.remove(idx)
+            if found:
+                return True
+        return False
+
+    def grid(self):
+        return to_grid([bit_to_digit(bit) for bit in self.cells])
@@ -0,0 +1,123 @@
+"""مرحلة الإقلاع: تهيئة مخطط قاعدة البيانات وتسجيل webhook خارج مسار الطلبات
+
+تُشغَّل مرة واحدة لكل نشر (أمر release/pre-deploy) بدل أن يكررها كل عامل عند الاستيراد أو أول طلب:
+    python startup.py check-generator     (ناتج المولد لبذور ثابتة لم يتغير دون رفع ALGORITHM_VERSION)
+    python startup.py init-db
+    python startup.py set-webhook
+    python startup.py all
+    python startup.py materialize-grids    (قبل نشر رفع ALGORITHM_VERSION، بالإصدار القديم)
+
+عند التشغيل بـ python app.py تُنفَّذ نفس المهام في خيط خلفي (RUN_STARTUP_TASKS=0 لتعطيلها).
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+
+
+def init_schema(db_url=None):
+    """إنشاء الجداول وتطبيق الترحيلات المعلقة (آمن للتكرار وبين العمليات)"""
+    from database import Database
+    db = Database(db_url, minconn=0, maxconn=1, lazy=True)
+    try:
+        db.init_schema()
+    finally:
+        db.pool.closeall()
+
+
+def register_webhook(token, url, attempts=5, delay=1.0):
+    """تسجيل webhook مع إعادة المحاولة بتأخير متضاعف، تعيد True عند النجاح"""
+    from telegram import Bot
+
+    async def setup():
+        async with Bot(token) as bot:
+            await bot.set_webhook(url=url)
+
+    for attempt in range(1, attempts + 1):
+        try:
+            asyncio.run(setup())
+            logger.info(f"Webhook set to {url}")
+            return True
+        except Exception as e:
+            logger.error(f"Webhook registration attempt {attempt}/{attempts} failed: {e}")
+            if attempt < attempts:
+                time.sleep(delay * 2 ** (attempt - 1))
+    return False
+
+
+def webhook_url(token):
+    return f"{os.environ.get('GAME_URL', '').rstrip('/')}/{token}"
+
+
+def materialize_grids(db_url=None):
+    """كتابة شبكات الألعاب المخزنة بمعرّف فقط حتى تبقى قابلة للقراءة بعد رفع إصدار المولد"""
+    import multiprocessing
+    import random
+    from database import Database
+    # العمليات تُنشأ قبل فتح الاتصال حتى لا ترث مقبس قاعدة البيانات
+    with multiprocessing.Pool(initializer=random.seed) as pool:
+        db = Database(db_url, minconn=0, maxconn=1, lazy=True)
+        try:
+            return db.materialize_puzzle_grids(pool=pool)
+        finally:
+            db.pool.closeall()
+
+
+def run_tasks(tasks):
+    ok = True
+    if 'check-generator' in tasks:
+        from sudoku import check_generator
+        try:
+            check_generator()
+        except Exception as e:
+            logger.error(f"Generator check failed: {e}")
+            ok = False
+    if 'materialize-grids' in tasks:
+        try:
+            materialize_grids()
+        except Exception as e:
+            logger.error(f"Grid materialization failed: {e}")
+            ok = False
+    if 'init-db' in tasks:
+        try:
+            init_schema()
+        except Exception as e:
+            logger.error(f"Schema bootstrap failed: {e}")
+            ok = False
+    if 'set-webhook' in tasks:
+        token = os.environ.get('BOT_TOKEN')
+        if token:
+            ok = register_webhook(token, webhook_url(token)) and ok
+        else:
+            logger.error("BOT_TOKEN is not set, skipping webhook registration")
+            ok = False
+    return ok
+
+
+def run_in_background(tasks=('check-generator', 'init-db', 'set-webhook')):
+    """تنفيذ مهام الإقلاع في خيط خلفي حتى يبدأ الخادم بخدمة الطلبات فوراً"""
+    thread = threading.Thread(target=run_tasks, args=(tasks,), name='startup-tasks', daemon=True)
+    thread.start()
+    return thread
+
+
+def main(argv=None):
+    load_dotenv()
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+    parser = argparse.ArgumentParser(description="One-off startup tasks: generator check, schema bootstrap and webhook registration")
+    parser.add_argument('task', choices=['check-generator', 'init-db', 'set-webhook', 'materialize-grids', 'all'])
+    args = parser.parse_args(argv)
+    tasks = ('check-generator', 'init-db', 'set-webhook') if args.task == 'all' else (args.task,)
+    if not run_tasks(tasks):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
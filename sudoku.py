@@ -1,4 +1,30 @@
 import random
+import functools
+import hashlib
+import multiprocessing
+from solver import BitmaskSolver
+from grader import grade_puzzle, matches_difficulty
+from metrics import GENERATE_SECONDS, SOLVER_NODES
+from transforms import random_transform, apply_transform
+from cache import LRUCache
+from codec import encode_grid
+
+# عدد محاولات الحذف للوصول إلى نطاق الصعوبة المطلوب قبل القبول بآخر لغز
+MAX_GRADE_ATTEMPTS = 10
+
+# اللغز معرَّف بالكامل بـ (إصدار الخوارزمية، المستوى، البذرة). أي تغيير يغيّر ناتج التوليد
+# لنفس البذرة (الحل، الحذف، التقييم، ترتيب استهلاك الأرقام العشوائية) يجب أن يرفع هذا الرقم.
+# الألعاب الجارية تحتفظ بشبكتيها فلا يمسها الرفع؛ قبل نشره شغّل python startup.py materialize-grids
+# بالإصدار القديم حتى لا تفقد الألعاب المنتهية شبكاتها، ثم أضف بصمات الإصدار الجديد إلى GOLDEN_PUZZLES.
+ALGORITHM_VERSION = 1
+
+# بصمة (puzzle, solution) لبذور ثابتة، يقارنها check_generator() حتى لا يتغير الناتج دون رفع الإصدار
+GOLDEN_PUZZLES = {
+    '1:easy:101': '4a02a8336f09ff77',
+    '1:medium:202': 'a000616c12780b4e',
+    '1:hard:303': '51adaa802035a302',
+    '1:expert:404': '604328d086f55966',
+}
 
 class SudokuGenerator:
     def __init__(self):
@@ -19,46 +45,73 @@ class SudokuGenerator:
                     return False
         return True
 
-    def solve_board(self):
-        for row in range(9):
-            for col in range(9):
-                if self.board[row][col] == 0:
-                    numbers = list(range(1, 10))
-                    random.shuffle(numbers)
-                    for num in numbers:
-                        if self.is_valid(row, col, num):
-                            self.board[row][col] = num
-                            if self.solve_board():
-                                return True
-                            self.board[row][col] = 0
-                    return False
+    def solve_board(self, rng=None):
+        solver = BitmaskSolver(self.board, rng=rng)
+        solved = solver.solve()
+        SOLVER_NODES.observe(solver.nodes)
+        if not solved:
+            return False
+        self.board = solver.grid()
         return True
 
-    def generate_full_board(self):
-        self.board = [[0 for _ in range(9)] for _ in range(9)]
-        self.solve_board()
+    def generate_full_board(self, rng=None):
+        solver = BitmaskSolver(rng=rng, hidden_singles=False)
+        solver.seed_diagonal_boxes()
+        solver.solve()
+        SOLVER_NODES.observe(solver.nodes)
+        self.board = solver.grid()
         return self.board
 
-    def remove_numbers(self, difficulty):
+    def remove_numbers(self, difficulty, unique=True, rng=None):
+        rng = rng or random
         cells_to_remove = {'easy': 35, 'medium': 45, 'hard': 55, 'expert': 65}.get(difficulty, 45)
+        if unique:
+            return self._carve_unique(cells_to_remove, rng)
         puzzle = [row[:] for row in self.board]
         cells = [(i, j) for i in range(9) for j in range(9)]
-        random.shuffle(cells)
+        rng.shuffle(cells)
         for i, j in cells[:cells_to_remove]:
             puzzle[i][j] = 0
         return puzzle
 
-    def generate_puzzle(self, difficulty='medium'):
-        self.generate_full_board()
+    def _carve_unique(self, cells_to_remove, rng):
+        """حذف الخلايا واحدة تلو الأخرى مع الإبقاء على حل وحيد
+
+        حالة الأقنعة تُحدَّث تدريجياً على نفس المحرك، ولا تُحذف الخلية إلا إذا لم يوجد حل
+        يضع فيها رقماً آخر. قد يتوقف الحذف قبل العدد المطلوب إذا لم يبقَ ما يمكن حذفه.
+        """
+        solver = BitmaskSolver(self.board)
+        cells = list(range(81))
+        rng.shuffle(cells)
+        removed = 0
+        for idx in cells:
+            if removed >= cells_to_remove:
+                break
+            bit = solver.cells[idx]
+            solver.remove(idx)
+            if solver.has_alternative(idx, bit):
+                solver.place(idx, bit)
+            else:
+                removed += 1
+        return solver.grid()
+
+    def generate_puzzle(self, difficulty='medium', seed=None):
+        """توليد (puzzle, solution)؛ مع seed يكون الناتج نفسه دائماً لنفس الإصدار والمستوى"""
+        rng = random.Random(seed) if seed is not None else random
+        with GENERATE_SECONDS.time(difficulty=difficulty):
+            for _ in range(MAX_GRADE_ATTEMPTS):
+                self.generate_full_board(rng)
+                puzzle = self.remove_numbers(difficulty, rng=rng)
+                if matches_difficulty(grade_puzzle(puzzle), difficulty):
+                    break
         solution = [row[:] for row in self.board]
-        puzzle = self.remove_numbers(difficulty)
         return puzzle, solution
 
-    def get_hint(self, puzzle, solution):
+    def get_hint(self, puzzle, solution, rng=None):
         """إرجاع خلية فارغة مع قيمتها الصحيحة للتلميح"""
         empty_cells = [(i, j) for i in range(9) for j in range(9) if puzzle[i][j] == 0]
         if empty_cells:
-            i, j = random.choice(empty_cells)
+            i, j = (rng or random).choice(empty_cells)
             return {'row': i, 'col': j, 'value': solution[i][j]}
         return None
 
@@ -81,4 +134,146 @@ class SudokuGenerator:
             box_nums = [board[start_row + i][start_col + j] for i in range(3) for j in range(3)]
             if len(set(box_nums)) != 9:
                 return False
-        return True
\ No newline at end of file
+        return True
+
+
+def make_puzzle_id(difficulty, seed):
+    return f"{ALGORITHM_VERSION}:{difficulty}:{seed}"
+
+
+def make_derived_id(base_id, transform_seed):
+    """معرّف لغز مشتق من لغز أساس بتحويل تماثل مولَّد من transform_seed"""
+    return f"{base_id}/{transform_seed}"
+
+
+def derive_puzzle(base_id, transform_seed):
+    return _transformed(*puzzle_from_id(base_id), transform_seed)
+
+
+def _transformed(puzzle, solution, transform_seed):
+    transform = random_transform(random.Random(transform_seed))
+    return apply_transform(puzzle, transform), apply_transform(solution, transform)
+
+
+def parse_puzzle_id(puzzle_id):
+    """يعيد (version, difficulty, seed) ويرفع ValueError للمعرّف غير الصالح"""
+    version, difficulty, seed = puzzle_id.split(':')
+    return int(version), difficulty, int(seed)
+
+
+def can_regenerate(puzzle_id):
+    """هل يستطيع الإصدار الحالي من المولد إعادة بناء هذا المعرّف"""
+    try:
+        return parse_puzzle_id(puzzle_id.split('/', 1)[0])[0] == ALGORITHM_VERSION
+    except ValueError:
+        return False
+
+
+def _grid_digest(puzzle, solution):
+    return hashlib.sha256((encode_grid(puzzle) + encode_grid(solution)).encode('ascii')).hexdigest()[:16]
+
+
+def check_generator():
+    """توليد بذور GOLDEN_PUZZLES ومقارنة بصماتها، يرفع RuntimeError إذا تغيّر الناتج دون رفع ALGORITHM_VERSION"""
+    golden = {pid: digest for pid, digest in GOLDEN_PUZZLES.items() if can_regenerate(pid)}
+    if not golden:
+        raise RuntimeError(f"No golden puzzles for algorithm v{ALGORITHM_VERSION}, add them to GOLDEN_PUZZLES")
+    for puzzle_id, expected in golden.items():
+        _, difficulty, seed = parse_puzzle_id(puzzle_id)
+        puzzle, solution = SudokuGenerator().generate_puzzle(difficulty, seed=seed)
+        if _grid_digest(puzzle, solution) != expected:
+            raise RuntimeError(f"Generator output for {puzzle_id} changed without an ALGORITHM_VERSION bump")
+
+
+def new_seed():
+    return random.getrandbits(48)
+
+
+def generate_with_id(difficulty, seed=None):
+    """توليد لغز ببذرة (عشوائية إذا لم تُحدد)، يعيد (puzzle, solution, puzzle_id)"""
+    if seed is None:
+        seed = new_seed()
+    puzzle, solution = SudokuGenerator().generate_puzzle(difficulty, seed=seed)
+    return puzzle, solution, make_puzzle_id(difficulty, seed)
+
+
+# شبكات معروفة مسبقاً (من المخزون عند بدء اللعبة أو من إعادة توليد متوازية) تُقرأ قبل إعادة التوليد
+_known = LRUCache(maxsize=4096, ttl=6 * 3600)
+
+
+def remember_puzzle(puzzle_id, puzzle, solution):
+    _known.set(puzzle_id, (tuple(map(tuple, puzzle)), tuple(map(tuple, solution))))
+
+
+@functools.lru_cache(maxsize=4096)
+def _regenerate(puzzle_id):
+    version, difficulty, seed = parse_puzzle_id(puzzle_id)
+    if version != ALGORITHM_VERSION:
+        raise ValueError(f"Puzzle {puzzle_id} was made by algorithm v{version}, this is v{ALGORITHM_VERSION}")
+    puzzle, solution = SudokuGenerator().generate_puzzle(difficulty, seed=seed)
+    return tuple(map(tuple, puzzle)), tuple(map(tuple, solution))
+
+
+def puzzle_from_id(puzzle_id):
+    """إعادة بناء (puzzle, solution) من المعرّف، مع ذاكرة مؤقتة للمعرّفات الأخيرة"""
+    known = _known.get(puzzle_id)
+    if known is not None:
+        puzzle, solution = known
+    elif '/' in puzzle_id:
+        base_id, transform_seed = puzzle_id.rsplit('/', 1)
+        return derive_puzzle(base_id, int(transform_seed))
+    else:
+        puzzle, solution = _regenerate(puzzle_id)
+    return [list(row) for row in puzzle], [list(row) for row in solution]
+
+
+def _regenerate_one(puzzle_id):
+    return puzzle_id, _regenerate(puzzle_id)
+
+
+def regenerate_many(puzzle_ids, pool=None, chunksize=4):
+    """إعادة بناء عدة معرّفات دفعة واحدة، يعيد {puzzle_id: (puzzle, solution)}
+
+    كل لغز أساس مختلف يُولَّد مرة واحدة فقط (والمشتقات منه تُحوَّل محلياً)، وعلى عمليات pool إن وُجد.
+    النتائج تُجمع في قاموس محلي لا في _known، فلا تطرد دفعة أكبر من الذاكرة المؤقتة ما بنته العمليات.
+    """
+    bases = {}
+    missing = []
+    for base_id in {puzzle_id.split('/', 1)[0] for puzzle_id in puzzle_ids}:
+        known = _known.get(base_id)
+        if known is None:
+            missing.append(base_id)
+        else:
+            bases[base_id] = known
+    if pool is not None and len(missing) > 1:
+        results = pool.imap_unordered(_regenerate_one, missing, chunksize)
+    else:
+        results = map(_regenerate_one, missing)
+    bases.update(results)
+    grids = {}
+    for puzzle_id in set(puzzle_ids):
+        base_id, _, transform_seed = puzzle_id.partition('/')
+        puzzle, solution = bases[base_id]
+        puzzle, solution = [list(row) for row in puzzle], [list(row) for row in solution]
+        grids[puzzle_id] = _transformed(puzzle, solution, int(transform_seed)) if transform_seed else (puzzle, solution)
+    return grids
+
+
+def _generate_one(difficulty):
+    return SudokuGenerator().generate_puzzle(difficulty)
+
+
+def generate_puzzles(difficulty, n, workers=None, chunksize=16):
+    """توليد n لغزاً موزعة على عدة عمليات وإرجاعها كتدفق (puzzle, solution) بترتيب الانتهاء
+
+    workers=None يستخدم كل الأنوية، وworkers=1 يولّد في العملية الحالية دون pool.
+    """
+    workers = workers or multiprocessing.cpu_count()
+    if workers == 1:
+        generator = SudokuGenerator()
+        for _ in range(n):
+            yield generator.generate_puzzle(difficulty)
+        return
+    # random.seed() في كل عملية حتى لا ترث العمليات المتفرعة نفس حالة المولد العشوائي
+    with multiprocessing.Pool(workers, initializer=random.seed) as pool:
+        yield from pool.imap_unordered(_generate_one, [difficulty] * n, chunksize)
@@ -0,0 +1,33 @@
+"""تحويلات التماثل للوحات السودوكو
+
+إعادة ترقيم الأرقام، تبديل الصفوف داخل كل نطاق والأعمدة داخل كل عمود كتل، تبديل النطاقات والكتل،
+والتدوير حول القطر. كلها تحافظ على صحة الحل ووحدانيته ورتبة الصعوبة، وتعطي قرابة 1.2 مليار
+لوحة مختلفة من كل لوحة أساس.
+"""
+
+
+def _line_permutation(rng):
+    """ترتيب عشوائي للأسطر 0-8 يبقي كل نطاق من 3 أسطر متجاوراً"""
+    bands = [0, 1, 2]
+    rng.shuffle(bands)
+    order = []
+    for band in bands:
+        lines = [band * 3, band * 3 + 1, band * 3 + 2]
+        rng.shuffle(lines)
+        order.extend(lines)
+    return order
+
+
+def random_transform(rng):
+    """تحويل عشوائي: (digits, rows, cols, transpose)"""
+    digits = list(range(1, 10))
+    rng.shuffle(digits)
+    return [0] + digits, _line_permutation(rng), _line_permutation(rng), rng.random() < 0.5
+
+
+def apply_transform(grid, transform):
+    digits, rows, cols, transpose = transform
+    out = [[digits[grid[r][c]] for c in cols] for r in rows]
+    if transpose:
+        out = [list(col) for col in zip(*out)]
+    return out